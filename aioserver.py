@@ -0,0 +1,127 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, game server on the standard library asynchronous sockets
+(asyncore and asynchat), speaking the same protocol as server.py without
+needing Twisted."""
+
+__revision__ = "20261018"
+
+import asynchat
+import asyncore
+import socket
+from optparse import OptionParser
+
+import session
+import tables
+
+class BriscolaChannel(asynchat.async_chat):
+    """A client connection, handled by a session.Session. Like
+    twisted.protocols.basic.LineReceiver, lines end with \r\n and the
+    connection is closed if one is longer than 'maxlength'."""
+
+    maxlength = 16384
+
+    def __init__(self, sock, registry, channels):
+        asynchat.async_chat.__init__(self, sock, map=channels)
+        self.set_terminator("\r\n")
+        self.buffer = []
+        self.length = 0
+        # complete lines of the current read
+        self.lines = []
+        self.session = session.Session(registry, self.push)
+        self.push(self.session.greeting())
+
+    def handle_read(self):
+        """Answer all the lines read at once with a single write."""
+        asynchat.async_chat.handle_read(self)
+
+        if self.length > self.maxlength:
+            self.handle_close()
+            return
+
+        if self.lines:
+            lines, self.lines = self.lines, []
+            self.push(self.session.receivelines(lines))
+
+        if self.session.closed:
+            self.session.disconnect()
+            self.close_when_done()
+
+    def collect_incoming_data(self, data):
+        self.length += len(data)
+        if self.length > self.maxlength:
+            # keep nothing more, the connection is to be closed
+            self.buffer = []
+            return
+        self.buffer.append(data)
+
+    def found_terminator(self):
+        if self.length <= self.maxlength:
+            self.lines.append("".join(self.buffer))
+            self.buffer = []
+            self.length = 0
+
+    def handle_close(self):
+        self.session.disconnect()
+        self.close()
+
+class BriscolaServer(asyncore.dispatcher):
+    """Accept connections on 'port', all sharing the tables of one
+    tables.TableRegistry, see it for 'samples' and 'budget'."""
+
+    def __init__(self, port, channels=None, samples=tables.BOTSAMPLES,
+                 budget=tables.BOTBUDGET):
+        if channels is None:
+            channels = {}
+        asyncore.dispatcher.__init__(self, map=channels)
+        self.channels = channels
+        self.registry = tables.TableRegistry(samples, budget)
+
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind(('', port))
+        self.listen(128)
+
+    def handle_accept(self):
+        connection = self.accept()
+        if connection is not None:
+            BriscolaChannel(connection[0], self.registry, self.channels)
+
+    def serve(self):
+        """Handle connections forever."""
+        asyncore.loop(timeout=30, use_poll=True, map=self.channels)
+
+def main():
+    parser = OptionParser(usage="%prog [options]",
+                          version="%%prog %s" % __revision__)
+    parser.add_option("-p", "--port", type="int", default=1042,
+                      help="port to listen on")
+    parser.add_option("-s", "--samples", type="int",
+                      default=tables.BOTSAMPLES,
+                      help="Monte Carlo samples per bot move")
+    parser.add_option("-b", "--budget", type="int",
+                      default=tables.BOTBUDGET,
+                      help="Monte Carlo milliseconds per bot move")
+    options, args = parser.parse_args()
+
+    BriscolaServer(options.port, samples=options.samples,
+                   budget=options.budget).serve()
+
+if __name__ == "__main__":
+    main()
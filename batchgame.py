@@ -0,0 +1,270 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, vectorized engine. Play thousands of AI-only games in lockstep,
+holding them as NumPy arrays of card ids."""
+
+__revision__ = "20261018"
+
+import time
+from optparse import OptionParser
+from random import Random
+
+import numpy
+
+import briscola
+
+NCARDS = briscola.NCARDS
+
+IDSEED = numpy.array(briscola.IDSEED, dtype=numpy.int8)
+IDRANK = numpy.array(briscola.IDRANK, dtype=numpy.int8)
+IDPOINTS = numpy.array(briscola.IDPOINTS, dtype=numpy.int16)
+# BEATS[trump, first, second], see briscola.idbeats()
+BEATS = numpy.array(briscola.BEATS, dtype=bool).reshape(
+    (briscola.NSEEDS, NCARDS, NCARDS))
+
+def shuffleddecks(seeds):
+    """shuffleddecks(seeds) -> array
+    Return a (len(seeds), NCARDS) array of card ids, each row shuffled like
+    the cards of briscola.Deck(seed)."""
+    decks = numpy.empty((len(seeds), NCARDS), dtype=numpy.int8)
+
+    for row, seed in enumerate(seeds):
+        cards = range(NCARDS)
+        Random(seed).shuffle(cards)
+        decks[row] = cards
+
+    return decks
+
+def handwinners(played, trump):
+    """handwinners(played, trump) -> array
+    Array version of briscola.handwinner(): given a (K, ncards) array of
+    played card ids and a (K, ) array of briscola seed indexes, return the
+    index of the winning card of each trick."""
+    rows = numpy.arange(len(played))
+    winner = numpy.zeros(len(played), dtype=numpy.intp)
+    winnerid = played[:, 0]
+
+    for idx in range(1, played.shape[1]):
+        cid = played[:, idx]
+        lose = ~BEATS[trump, winnerid, cid]
+        winner[lose] = idx
+        winnerid = played[rows, winner]
+
+    return winner
+
+def aichoices(hands, winnerid, trump):
+    """aichoices(hands, winnerid, trump) -> array
+    Array version of briscola.Player.aiplaycard(). 'hands' is a (K, ncards)
+    array of card ids, already sorted by points, 'winnerid' holds the ids of
+    the cards currently winning each trick. Return the index of the chosen
+    card in each hand."""
+    seeds, points = IDSEED[hands], IDPOINTS[hands]
+    winnerseed = IDSEED[winnerid][:, None]
+    winnerpoints = IDPOINTS[winnerid][:, None]
+
+    good = ((seeds == winnerseed) & (points > winnerpoints)) | \
+           ((winnerpoints > 0) & (winnerseed != trump[:, None]) &
+            (seeds == trump[:, None]))
+
+    return numpy.where(good.any(1), good.argmax(1), 0)
+
+class BatchGame:
+    """K games with the same number of non-human players, advanced one trick
+    at a time. Since every game draws and plays the same number of cards at
+    each step, only their contents differ: 'deck' is a (K, ncards) array,
+    'hands' a (K, nplayers, 3) array and 'points' a (K, nplayers) array,
+    all indexed by seat. 'leader' holds the seat playing first in the
+    current trick."""
+
+    def __init__(self, nplayers, decks):
+        """Set up a game for each row of 'decks', a (K, NCARDS) array of card
+        ids in the order of briscola.Deck.cards. Cards are dealt as in
+        briscola.Game."""
+        if nplayers not in (2, 3, 4):
+            raise briscola.InvalidNumberOfPlayers, nplayers
+
+        self.nplayers = nplayers
+        self.ngames = len(decks)
+        self.rows = numpy.arange(self.ngames)
+
+        deck = numpy.array(decks, dtype=numpy.int8)
+
+        if nplayers == 3:
+            # remove the first 'two' of each deck, see briscola.Deck
+            keep = numpy.ones(deck.shape, dtype=bool)
+            keep[self.rows, (IDRANK[deck] == 0).argmax(1)] = False
+            deck = deck[keep].reshape((self.ngames, NCARDS - 1))
+
+        self.ndeck = deck.shape[1]
+        self.ncards = 3
+        self.handsize = self.ncards
+
+        # give cards
+        self.hands = numpy.empty((self.ngames, nplayers, self.ncards),
+                                 dtype=numpy.int8)
+        for seat in range(nplayers):
+            for idx in range(self.ncards):
+                self.ndeck -= 1
+                self.hands[:, seat, idx] = deck[:, self.ndeck]
+
+        # set the briscola, putting it at the bottom of the deck
+        self.briscola = deck[:, self.ndeck - 1].copy()
+        deck[:, 1:self.ndeck] = deck[:, :self.ndeck - 1].copy()
+        deck[:, 0] = self.briscola
+        self.deck = deck
+        self.trump = IDSEED[self.briscola]
+
+        self.points = numpy.zeros((self.ngames, nplayers), dtype=numpy.int16)
+        self.leader = numpy.zeros(self.ngames, dtype=numpy.intp)
+
+    def finished(self):
+        """finished() -> boolean
+        Return True when every card has been played."""
+        return self.handsize == 0
+
+    def step(self):
+        """Play a trick in every game, score it and draw new cards."""
+        rows, nplayers, size = self.rows, self.nplayers, self.handsize
+
+        played = numpy.empty((self.ngames, nplayers), dtype=numpy.int8)
+        cols = numpy.arange(size - 1)
+
+        for turn in range(nplayers):
+            seat = (self.leader + turn) % nplayers
+            hand = self.hands[rows, seat, :size]
+
+            if turn == 0 or size == 1:
+                choice = numpy.zeros(self.ngames, dtype=numpy.intp)
+            else:
+                # aiplaycard() sorts the hand by points before choosing
+                order = IDPOINTS[hand].argsort(1, kind='mergesort')
+                hand = hand[rows[:, None], order]
+                choice = aichoices(hand, winnerid, self.trump)
+
+            card = hand[rows, choice]
+            played[:, turn] = card
+
+            # remove the card, keeping the order of the others
+            src = cols[None, :] + (cols[None, :] >= choice[:, None])
+            self.hands[rows, seat, :size - 1] = hand[rows[:, None], src]
+
+            if turn == 0:
+                winner = numpy.zeros(self.ngames, dtype=numpy.intp)
+                winnerid = card
+            else:
+                lose = ~BEATS[self.trump, winnerid, card]
+                winner[lose] = turn
+                winnerid = numpy.where(lose, card, winnerid)
+
+        self.leader = (self.leader + winner) % nplayers
+        self.points[rows, self.leader] += IDPOINTS[played].sum(1)
+        self.handsize -= 1
+
+        if self.ndeck:
+            for turn in range(nplayers):
+                seat = (self.leader + turn) % nplayers
+                self.ndeck -= 1
+                self.hands[rows, seat, self.handsize] = \
+                    self.deck[:, self.ndeck]
+            self.handsize += 1
+
+    def play(self):
+        """play() -> array
+        Play every game until the end, return the final points."""
+        while not self.finished():
+            self.step()
+        return self.points
+
+    def winners(self):
+        """winners() -> array
+        Return the winning seat of each game, or the winning team (0 for
+        even seats, 1 for odd seats) in four players games. Draws are -1."""
+        if self.nplayers == 4:
+            points = numpy.column_stack((self.points[:, 0::2].sum(1),
+                                         self.points[:, 1::2].sum(1)))
+        else:
+            points = self.points
+
+        ranking = numpy.sort(points, 1)
+        return numpy.where(ranking[:, -1] != ranking[:, -2],
+                           points.argmax(1), -1)
+
+def playobjectgames(nplayers, seeds):
+    """playobjectgames(nplayers, seeds) -> list
+    Play the same games with the object engine of briscola.py. Return the
+    final points of each game, indexed by seat."""
+    # imported here, since only needed for comparisons
+    from selfplay import HeadlessGame
+
+    results = []
+    for seed in seeds:
+        game = HeadlessGame(nplayers, seed)
+        game.mainloop()
+
+        points = [ 0 ] * nplayers
+        for player in game.players:
+            points[player.number] = player.points
+        results.append(points)
+
+    return results
+
+def main():
+    parser = OptionParser(usage="%prog [options]",
+                          version="%%prog %s" % __revision__)
+    parser.add_option("-n", "--games", type="int", default=10000,
+                      help="games to play in lockstep")
+    parser.add_option("-p", "--players", type="int", default=2,
+                      help="number of players (2, 3 or 4)")
+    parser.add_option("-s", "--seed", type="int", default=0,
+                      help="seed of the first game")
+    parser.add_option("-c", "--check", type="int", default=0,
+                      help="replay this many games with the object engine "
+                           "and compare results")
+    options, args = parser.parse_args()
+
+    seeds = range(options.seed, options.seed + options.games)
+
+    start = time.time()
+    game = BatchGame(options.players, shuffleddecks(seeds))
+    game.play()
+    elapsed = time.time() - start
+
+    winners = game.winners()
+    print "%s players: %s games, %s draws" % (options.players,
+        options.games, (winners == -1).sum())
+    for winner in range(game.points.shape[1] if options.players < 4 else 2):
+        print "  %s %s wins: %s" % (options.players < 4 and "seat" or "team",
+                                    winner, (winners == winner).sum())
+    print "%s games in %.2fs (%.0f games/s)" % (options.games, elapsed,
+        options.games / max(elapsed, 1e-9))
+
+    if options.check:
+        checked = seeds[:options.check]
+
+        start = time.time()
+        points = playobjectgames(options.players, checked)
+        elapsed = time.time() - start
+
+        mismatches = (game.points[:len(checked)] != points).any(1).sum()
+        print "object engine: %s games in %.2fs (%.0f games/s), " \
+            "%s mismatches" % (len(checked), elapsed,
+                               len(checked) / max(elapsed, 1e-9), mismatches)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, rules engine benchmarks. Time the building blocks of
+briscola.py and whole AI-only games, write the results as JSON and compare
+them with a stored baseline to catch regressions."""
+
+__revision__ = "20261018"
+
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+from optparse import OptionParser
+from random import Random
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+import briscola
+from selfplay import HeadlessGame
+
+# seed of the random stream of each benchmark, so that every benchmark
+# gets the same cards whether it runs alone or along with the others
+SEED = 1042
+
+def aiplayers(nplayers):
+    """aiplayers(nplayers) -> list
+    Return 'nplayers' non-human players."""
+    return [ briscola.Player(name, ishuman=False, team=idx % 2 and 'b' or 'a',
+                             number=idx)
+             for idx, name in enumerate(briscola.Game.nonhumans[:nplayers]) ]
+
+def benchbeats():
+    rand = Random(SEED)
+    first, second = rand.sample(briscola.CARDS, 2)
+    trump = rand.choice(briscola.CARDS)
+    return lambda: first.beats(second, trump)
+
+def benchhandwinner(nplayers):
+    def setup():
+        rand = Random(SEED)
+        cards = rand.sample(briscola.CARDS, nplayers)
+        trump = rand.choice(briscola.CARDS)
+        return lambda: briscola.handwinner(cards, trump, 0, 1)
+    return setup
+
+def benchdeck():
+    rand = Random(SEED)
+    return lambda: briscola.Deck(rand.random())
+
+def benchgameinit(nplayers):
+    def setup():
+        rand = Random(SEED)
+        players = aiplayers(nplayers)
+        return lambda: briscola.Game(players, rand.random())
+    return setup
+
+def benchgivecards():
+    game = briscola.Game(aiplayers(2), SEED)
+    cards = briscola.Deck(SEED).cards
+
+    def givecards():
+        game.deck.cards = cards[:]
+        game.givecards()
+    return givecards
+
+def benchaiplaycard():
+    rand = Random(SEED)
+    player = aiplayers(1)[0]
+    cards = rand.sample(briscola.CARDS, 5)
+
+    def aiplaycard():
+        player.hand = cards[:3]
+        player.aiplaycard(cards[3:4], cards[4])
+    return aiplaycard
+
+def benchgames(nplayers):
+    def setup():
+        rand = Random(SEED)
+        return lambda: HeadlessGame(nplayers, rand.random()).mainloop()
+    return setup
+
+# name, function returning the callable to time
+BENCHMARKS = [
+    ('card.beats', benchbeats),
+    ('handwinner.2', benchhandwinner(2)),
+    ('handwinner.3', benchhandwinner(3)),
+    ('handwinner.4', benchhandwinner(4)),
+    ('deck', benchdeck),
+    ('game.init.2', benchgameinit(2)),
+    ('game.init.4', benchgameinit(4)),
+    ('game.givecards', benchgivecards),
+    ('player.aiplaycard', benchaiplaycard),
+    ('games.2', benchgames(2)),
+    ('games.3', benchgames(3)),
+    ('games.4', benchgames(4)),
+]
+
+def timecall(function, repeat, mintime=0.2):
+    """timecall(function, repeat, mintime) -> float
+    Return the best time in seconds of a call of 'function', over 'repeat'
+    runs each lasting at least 'mintime' seconds."""
+    timer = timeit.Timer(function)
+
+    number = 1
+    while timer.timeit(number) < mintime / 10:
+        number *= 10
+
+    return min(timer.repeat(repeat, number)) / number
+
+def runbenchmarks(names=None, repeat=3):
+    """runbenchmarks(names, repeat) -> dict
+    Run the benchmarks called 'names', every one if None. Return the
+    seconds per call and calls per second of each of them."""
+    results = {}
+
+    for name, setup in BENCHMARKS:
+        if names and name not in names:
+            continue
+        seconds = timecall(setup(), repeat)
+        results[name] = { 'seconds': seconds, 'rate': 1.0 / seconds }
+
+    return results
+
+def compare(results, baseline, tolerance):
+    """compare(results, baseline, tolerance) -> list
+    Return the names of the benchmarks more than 'tolerance' (a fraction)
+    slower than in 'baseline', along with the ratio of the times."""
+    regressions = []
+
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name]['seconds'] / baseline[name]['seconds']
+        if ratio > 1 + tolerance:
+            regressions.append((name, ratio))
+
+    return regressions
+
+def main():
+    parser = OptionParser(usage="%prog [options] [benchmark...]",
+                          version="%%prog %s" % __revision__)
+    parser.add_option("-o", "--output",
+                      help="write results to this JSON file")
+    parser.add_option("-c", "--compare", metavar="BASELINE",
+                      help="compare with the results in this JSON file")
+    parser.add_option("-t", "--tolerance", type="float", default=0.1,
+                      help="slowdown to report as a regression "
+                           "(default 0.1, that is 10%)")
+    parser.add_option("-r", "--repeat", type="int", default=3,
+                      help="runs of each benchmark, the best is kept")
+    parser.add_option("-l", "--list", action="store_true",
+                      help="list the benchmarks and exit")
+    options, args = parser.parse_args()
+
+    if options.list:
+        for name, setup in BENCHMARKS:
+            print name
+        return 0
+
+    results = runbenchmarks(args, options.repeat)
+
+    if options.compare:
+        baseline = json.load(open(options.compare))['results']
+    else:
+        baseline = {}
+
+    for name, setup in BENCHMARKS:
+        if name not in results:
+            continue
+        line = "%-20s %12.2f us %12.0f /s" % (name,
+            results[name]['seconds'] * 1e6, results[name]['rate'])
+        if name in baseline:
+            line += "  %+6.1f%%" % (100 * (results[name]['seconds'] /
+                                           baseline[name]['seconds'] - 1))
+        print line
+
+    if options.output:
+        output = open(options.output, 'w')
+        json.dump({ 'revision': briscola.__revision__,
+                    'python': platform.python_version(),
+                    'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'results': results }, output, indent=2, sort_keys=True)
+        output.close()
+
+    regressions = compare(results, baseline, options.tolerance)
+    for name, ratio in regressions:
+        print "REGRESSION: %s is %.1f%% slower" % (name, 100 * (ratio - 1))
+
+    return regressions and 1 or 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, headless benchmark of the graphical user interface. Play
+GuiGame with non-human players only on SDL's dummy video driver, taking
+each trick off the field as soon as it is complete, and report how long
+frames, card animations and startup take."""
+
+__revision__ = "20261018"
+
+import json
+import os
+import platform
+import sys
+import time
+from optparse import OptionParser
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+# before pygame is initialized, no screen needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+import briscola
+import gui
+
+class BenchGame(gui.GuiGame):
+    """A GuiGame recording the time taken by each frame and by each card
+    animation, and the number of rectangles drawn."""
+
+    def __init__(self, nplayers, seed=None):
+        # seats around the field, see GuiPlayer.showhand()
+        numbers = { 2: (0, 2), 3: (0, 1, 2), 4: (0, 1, 2, 3) }[nplayers]
+        players = [ gui.GuiPlayer(name, ishuman=False, number=number,
+                                  team=idx % 2 and 'b' or 'a')
+                    for idx, (name, number) in
+                    enumerate(zip(self.nonhumans, numbers)) ]
+
+        self.frametimes = []
+        self.updatetimes = []
+        self.blits = 0
+        self.animationtimes = []
+        self.animationframes = []
+
+        gui.GuiGame.__init__(self, players, (gui.XRES, gui.YRES), seed=seed)
+
+    def updatescreen(self):
+        self.blits += len(self.dirty)
+        start = time.time()
+        gui.GuiGame.updatescreen(self)
+        self.updatetimes.append(time.time() - start)
+
+    def showplayedcard(self, idxplayer, idxcard):
+        gui.GuiGame.showplayedcard(self, idxplayer, idxcard)
+        self.animationstart = time.time()
+        self.animationframes.append(0)
+
+    def animate(self, elapsed):
+        gui.GuiGame.animate(self, elapsed)
+        self.animationframes[-1] += 1
+        if self.animation is None:
+            self.animationtimes.append(time.time() - self.animationstart)
+
+    def showresults(self):
+        # like GuiGame.showresults(), without printing the points
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        try:
+            gui.GuiGame.showresults(self)
+        finally:
+            sys.stdout = stdout
+
+    def play(self, elapsed):
+        """Run frames of 'elapsed' seconds until the end of the game,
+        clicking whenever a trick is complete."""
+        self.showtable()
+        self.updatescreen()
+
+        while not self.finished():
+            if self.animation is None and \
+                    len(self.cardsplayed) == len(self.players):
+                pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN,
+                                                     pos=(0, 0), button=1))
+
+            start = time.time()
+            self.frame(elapsed)
+            self.frametimes.append(time.time() - start)
+
+def summary(values):
+    """summary(values) -> dict
+    Mean, median, 95th percentile and maximum of 'values'."""
+    if not values:
+        return { 'mean': 0.0, 'median': 0.0, 'p95': 0.0, 'max': 0.0 }
+
+    values = sorted(values)
+    return { 'mean': sum(values) / len(values),
+             'median': values[len(values) // 2],
+             'p95': values[min(int(len(values) * 0.95), len(values) - 1)],
+             'max': values[-1] }
+
+def benchmark(ngames, nplayers, fps, seed=None):
+    """benchmark(ngames, nplayers, fps, seed) -> dict
+    Play 'ngames' games advancing 1/fps seconds per frame, return the
+    report. The startup time is the time taken by the first game to
+    display the field, with the images not loaded yet."""
+    gui.GuiGame.fps = fps
+    report = { 'games': ngames, 'players': nplayers, 'fps': fps,
+               'driver': os.environ['SDL_VIDEODRIVER'],
+               'python': platform.python_version(),
+               'pygame': pygame.version.ver }
+
+    frametimes, updatetimes, setuptimes = [], [], []
+    animationtimes, animationframes = [], []
+    blits = frames = 0
+
+    for idx in range(ngames):
+        start = time.time()
+        if seed is None:
+            game = BenchGame(nplayers)
+        else:
+            game = BenchGame(nplayers, briscola.gameseed(seed, idx))
+        game.showtable()
+        game.updatescreen()
+        setuptimes.append(time.time() - start)
+
+        game.play(1.0 / fps)
+
+        frames += len(game.frametimes)
+        blits += game.blits
+        frametimes.extend(game.frametimes)
+        updatetimes.extend(game.updatetimes)
+        animationtimes.extend(game.animationtimes)
+        animationframes.extend(game.animationframes)
+
+    report['startup'] = setuptimes[0]
+    report['setup'] = summary(setuptimes[1:])
+    report['frames'] = frames
+    report['frametime'] = summary(frametimes)
+    report['updatetime'] = summary(updatetimes)
+    report['blits'] = blits
+    report['blitsperframe'] = float(blits) / max(frames, 1)
+    report['animations'] = len(animationtimes)
+    report['animationtime'] = summary(animationtimes)
+    report['animationframes'] = summary(animationframes)
+
+    return report
+
+def main():
+    parser = OptionParser(usage="%prog [options]",
+                          version="%%prog %s" % __revision__)
+    parser.add_option("-n", "--games", type="int", default=5,
+                      help="games to play")
+    parser.add_option("-p", "--players", type="int", default=4,
+                      help="number of players (2, 3 or 4)")
+    parser.add_option("-f", "--fps", type="int", default=gui.GuiGame.fps,
+                      help="frames per second of the game clock")
+    parser.add_option("-s", "--seed", type="long",
+                      help="seed of the series of games, to replay them")
+    parser.add_option("-o", "--output",
+                      help="write the report to this JSON file")
+    options, args = parser.parse_args()
+
+    if options.players not in (2, 3, 4):
+        parser.error("only 2, 3 or 4 players games are supported")
+
+    report = benchmark(max(options.games, 1), options.players, options.fps,
+                       options.seed)
+
+    print "startup %.1fms, %s frames, %.1f blits per frame" % (
+        1000 * report['startup'], report['frames'], report['blitsperframe'])
+    for name in ('frametime', 'updatetime', 'animationtime'):
+        print "%-14s mean %8.3fms  p95 %8.3fms  max %8.3fms" % (name,
+            1000 * report[name]['mean'], 1000 * report[name]['p95'],
+            1000 * report[name]['max'])
+
+    if options.output:
+        output = open(options.output, 'w')
+        json.dump(report, output, indent=2, sort_keys=True)
+        output.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, benchmark of the game server transports. Start server.py
+(Twisted) and aioserver.py (asyncore) in turn, open many connections to
+each of them, and send commands on all of them at once, measuring
+connections and commands per second. With --pipeline, clients use the
+JSON-lines machine mode and send several requests per write."""
+
+__revision__ = "20261018"
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# script of each transport
+TRANSPORTS = [
+    ('twisted', 'server.py'),
+    ('asyncore', 'aioserver.py'),
+]
+
+def readline(sock, buffers):
+    """readline(sock, buffers) -> line
+    Read a line ending with \\n from 'sock'. What has been read past it is
+    kept in 'buffers', by socket."""
+    data = buffers.get(sock, "")
+    while "\n" not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise IOError, "connection closed"
+        data += chunk
+
+    line, buffers[sock] = data.split("\n", 1)
+    return line
+
+def waitserver(port, timeout=10.0):
+    """Wait until something listens on 'port'."""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            socket.create_connection(('localhost', port)).close()
+            return
+        except socket.error:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+def benchmark(port, nclients, rounds, command="players", pipeline=0):
+    """benchmark(port, nclients, rounds, command, pipeline) -> dict
+    Connect 'nclients' clients to the server on 'port', each of them
+    logging in and creating a table, then send 'command' on every
+    connection 'rounds' times, waiting for all the replies of a round
+    before the next one. If 'pipeline' is set, clients switch to machine
+    mode and send 'pipeline' requests per round in a single write."""
+    buffers = {}
+    socks = []
+
+    start = time.time()
+    for idx in range(nclients):
+        sock = socket.create_connection(('localhost', port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if pipeline:
+            sock.sendall('machine\r\n{"cmd": "login", "args": ["client%s"]}'
+                         '\r\n{"cmd": "create"}\r\n' % idx)
+        else:
+            sock.sendall("client%s\r\ncreate\r\n" % idx)
+        socks.append(sock)
+    for sock in socks:
+        # greeting and name (or machine mode) on the first line, then the
+        # table, or the name and the table
+        for line in range(pipeline and 3 or 2):
+            readline(sock, buffers)
+    connecttime = time.time() - start
+
+    if pipeline:
+        batch = "".join([ json.dumps({ 'id': idx, 'cmd': command }) + "\r\n"
+                          for idx in range(pipeline) ])
+    else:
+        batch = command + "\r\n"
+
+    start = time.time()
+    for idx in range(rounds):
+        for sock in socks:
+            sock.sendall(batch)
+        for sock in socks:
+            for reply in range(max(pipeline, 1)):
+                readline(sock, buffers)
+    commandtime = time.time() - start
+
+    for sock in socks:
+        sock.close()
+
+    return { 'clients': nclients,
+             'connections/s': nclients / max(connecttime, 1e-9),
+             'commands': nclients * rounds * max(pipeline, 1),
+             'commands/s': nclients * rounds * max(pipeline, 1) /
+                           max(commandtime, 1e-9) }
+
+def main():
+    parser = OptionParser(usage="%prog [options] [transport...]",
+                          version="%%prog %s" % __revision__)
+    parser.add_option("-c", "--clients", type="int", default=200,
+                      help="concurrent connections")
+    parser.add_option("-r", "--rounds", type="int", default=50,
+                      help="commands sent on each connection")
+    parser.add_option("-p", "--port", type="int", default=10420,
+                      help="port the servers listen on")
+    parser.add_option("-l", "--pipeline", type="int", default=0,
+                      help="JSON requests sent per write, in machine mode")
+    parser.add_option("-o", "--output",
+                      help="write the results to this JSON file")
+    options, args = parser.parse_args()
+
+    results = {}
+    for name, script in TRANSPORTS:
+        if args and name not in args:
+            continue
+
+        server = subprocess.Popen([ sys.executable,
+                                    os.path.join(MAINDIR, script),
+                                    "--port", str(options.port) ])
+        try:
+            waitserver(options.port)
+            results[name] = benchmark(options.port, options.clients,
+                                      options.rounds,
+                                      pipeline=options.pipeline)
+        finally:
+            server.terminate()
+            server.wait()
+
+        print "%-10s %8.0f connections/s %8.0f commands/s" % (name,
+            results[name]['connections/s'], results[name]['commands/s'])
+
+    if options.output:
+        output = open(options.output, 'w')
+        json.dump(results, output, indent=2, sort_keys=True)
+        output.close()
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,9 @@ See http://en.wikipedia.org/wiki/Briscola."""
 
 __revision__ = "20080921"
 
+import cProfile
+import time
+from collections import deque
 from random import Random, sample
 
 SEEDS = ( 'CUORI', 'QUADRI', 'PICCHE', 'FIORI' )
@@ -33,71 +36,202 @@ CARDSNAMES = [ 'DUE', 'QUATTRO', 'CINQUE', 'SEI', 'SETTE',
 
 CARDSPOINTS = { 'ASSO': 11, 'TRE': 10, 'RE': 4, 'DONNA': 3, 'JACK': 2 }        
 
+# Integer encoding of cards: each one of the NCARDS cards is identified by
+# seed * NRANKS + rank, where 'seed' is the index of its seed in SEEDS and
+# 'rank' the index of its value in CARDSNAMES. The ID* tuples are indexed by
+# card id.
+NSEEDS = len(SEEDS)
+NRANKS = len(CARDSNAMES)
+NCARDS = NSEEDS * NRANKS
+
+SEEDIDX = dict((seed, idx) for idx, seed in enumerate(SEEDS))
+RANKIDX = dict((value, idx) for idx, value in enumerate(CARDSNAMES))
+
+IDSEED = tuple(cid // NRANKS for cid in range(NCARDS))
+IDRANK = tuple(cid % NRANKS for cid in range(NCARDS))
+IDPOINTS = tuple(CARDSPOINTS.get(CARDSNAMES[cid % NRANKS], 0) 
+                 for cid in range(NCARDS))
+
+def cardid(seed, value):
+    """cardid(seed, value) -> int
+    Return the integer id of the card with the given seed and value."""
+    return SEEDIDX[seed] * NRANKS + RANKIDX[value]
+
+def idcard(cid):
+    """idcard(cid) -> Card
+    Return the card with the given id."""
+    return CARDS[cid]
+
+# draws the seeds of the games not given one, see Game: seeding a new
+# random.Random from system entropy for each of them would be slower
+SEEDER = Random()
+
+def getrandom(seed=None):
+    """getrandom(seed) -> random.Random
+    Return 'seed' itself if it is a random.Random instance, otherwise a new
+    random.Random seeded with it (with system entropy if None)."""
+    if isinstance(seed, Random):
+        return seed
+    return Random(seed)
+
+def gameseed(seed, idx):
+    """gameseed(seed, idx) -> long
+    Return the seed of the idx-th game of a series identified by 'seed'.
+    Each game gets its own random stream, so a series can be split among
+    several workers and still give the same deals."""
+    return seed << 32 | idx
+
+def shuffleddeals(count, seed=None):
+    """shuffleddeals(count, seed) -> generator
+    Yield 'count' shuffled lists of card ids, all drawn from the same
+    random stream (see getrandom()). Lists are in the order of Deck.cards."""
+    rand = getrandom(seed)
+    cards = range(NCARDS)
+    for idx in xrange(count):
+        rand.shuffle(cards)
+        yield cards[:]
+
+def beatstable():
+    """beatstable() -> tuple
+    Build the table telling whether a card beats another one for each
+    briscola seed. See idbeats()."""
+    table = []
+    for trump in range(NSEEDS):
+        for first in range(NCARDS):
+            for second in range(NCARDS):
+                firstseed, secondseed = IDSEED[first], IDSEED[second]
+
+                if firstseed == trump and secondseed != trump:
+                    table.append(True)
+                elif firstseed != trump and secondseed == trump:
+                    table.append(False)
+                elif firstseed == secondseed:
+                    table.append(IDRANK[first] > IDRANK[second])
+                else:
+                    table.append(True)
+    return tuple(table)
+
+BEATS = beatstable()
+
+def idbeats(first, second, trump):
+    """idbeats(first, second, trump) -> boolean
+    Return True if card id 'first', played before card id 'second', wins
+    over it when 'trump' is the seed index of the briscola."""
+    return BEATS[(trump * NCARDS + first) * NCARDS + second]
+
+# Precomputed trick resolution, indexed like BEATS. TRICK2 holds the index
+# (0 or 1) of the winner of a two cards trick, TAKES the id of the card
+# taking it.
+TRICK2 = tuple(int(not beats) for beats in BEATS)
+TAKES = tuple((idx // NCARDS % NCARDS) if beats else (idx % NCARDS)
+              for idx, beats in enumerate(BEATS))
+
 def handwinner(cardlist, briscola, first, second):
     """handwinner(cardlist, briscola, first, second) -> winner_idx
 
     Given a list of played cards, a briscola, and the index of two
     adjacent players, return which index is the winner."""
 
-    if len(cardlist) == 1:
-        # if only one card has been played
-        return first
+    base = briscola.seedidx * NCARDS * NCARDS
+    winner, winnerid = first, cardlist[first].id
 
-    if ( cardlist[first].beats(cardlist[second], briscola) ):
-        # the first card beats the second one
-        if (second+1 == len(cardlist)):
-            # no more players
-            return first
-        
-        return handwinner(cardlist, briscola, first, second+1)
-     
-    if (second+1 == len(cardlist)):
-        return second
+    for idx in range(second, len(cardlist)):
+        cid = cardlist[idx].id
+        if not BEATS[base + winnerid * NCARDS + cid]:
+            winner, winnerid = idx, cid
 
-    return handwinner(cardlist, briscola, second, second+1)
+    return winner
 
-class Card:
-    """Represents card objects and methods to compare two cards."""
-    
-    def __init__(self, seed, value):
-        """Create a new card instance with the given seed and value."""
-        self.seed = seed
-        self.value = value   
-        self.points = CARDSPOINTS.get(value, 0)
-    
-    def __cmp__(self, othercard):
-        """__cmp__(othercard) -> int
-        Compare the current card with 'othercard'."""
-        return cmp(self.points, othercard.points)
+def trickwinner(cardids, trump):
+    """trickwinner(cardids, trump) -> winner_idx
+
+    Table driven version of handwinner() working on card ids: 'cardids' is
+    the list of the ids of the cards played, in order, and 'trump' the seed
+    index of the briscola. Two cards tricks are solved with a single lookup
+    in TRICK2, longer ones chaining lookups in TAKES."""
+
+    if len(cardids) == 2:
+        return TRICK2[(trump * NCARDS + cardids[0]) * NCARDS + cardids[1]]
+
+    base = trump * NCARDS * NCARDS
+    winnerid = cardids[0]
+    for cid in cardids[1:]:
+        winnerid = TAKES[base + winnerid * NCARDS + cid]
+
+    return cardids.index(winnerid)
+
+class Card(object):
+    """Represents card objects and methods to compare two cards. There are
+    only NCARDS cards: Card(seed, value) returns the same immutable instance
+    every time, so cards can be compared by identity and used in sets and
+    as dictionary keys. Subclasses, which may need per card state, get new
+    instances instead. Ordering compares points."""
+
+    __slots__ = ( 'seed', 'value', 'id', 'seedidx', 'rank', 'points' )
+
+    def __new__(cls, seed, value, *args, **kwargs):
+        """Return the card with the given seed and value."""
+        if cls is Card:
+            return CARDS[cardid(seed, value)]
+        return cls.newcard(cardid(seed, value))
+
+    @classmethod
+    def newcard(cls, cid):
+        """newcard(cid) -> Card
+        Build a new instance of the card with the given id."""
+        card = object.__new__(cls)
+        setattr = object.__setattr__
+        setattr(card, 'seed', SEEDS[IDSEED[cid]])
+        setattr(card, 'value', CARDSNAMES[IDRANK[cid]])
+        setattr(card, 'id', cid)
+        setattr(card, 'seedidx', IDSEED[cid])
+        setattr(card, 'rank', IDRANK[cid])
+        setattr(card, 'points', IDPOINTS[cid])
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card objects are immutable")
+
+    def __reduce__(self):
+        return idcard, (self.id, )
+
+    def __hash__(self):
+        return self.id
+
+    def __lt__(self, othercard):
+        return self.points < othercard.points
+
+    def __le__(self, othercard):
+        return self.points <= othercard.points
+
+    def __gt__(self, othercard):
+        return self.points > othercard.points
+
+    def __ge__(self, othercard):
+        return self.points >= othercard.points
 
     def isbriscola(self, briscola):
         """isbriscola(briscola) -> boolean
         Return True if this card is briscola"""
-        return self.seed == briscola.seed
+        return self.seedidx == briscola.seedidx
     
     def beats(self, othercard, briscola):
         """beats(othercard, briscola) -> boolean
         Return True if this card wins over othercard"""
+        return BEATS[(briscola.seedidx * NCARDS + self.id) * NCARDS + 
+                     othercard.id]
 
-        if self.isbriscola(briscola) and not othercard.isbriscola(briscola):
-            return True
-        
-        if not self.isbriscola(briscola) and othercard.isbriscola(briscola):
-            return False
-        
-        if self.seed == othercard.seed:
-            return CARDSNAMES.index(self.value) > \
-                CARDSNAMES.index(othercard.value)
-
-        return True
+# the NCARDS cards, indexed by id
+CARDS = tuple(Card.newcard(cid) for cid in range(NCARDS))
 
 class Deck:
     """Represents a deck of cards."""
 
-    def __init__(self):
+    def __init__(self, seed=None):
         """Set up a new deck. The 'cards' list holds a list of objects whose
         type is Card. After instantiating the whole deck, the list is shuffled
-        with the shuffle method of random.Random."""
+        with the shuffle method of random.Random. 'seed' can be a seed or a
+        random.Random instance, see getrandom()."""
         self.briscola = None
         # will be set only if nplayers == 3
         self.removedcard = None
@@ -105,7 +239,7 @@ class Deck:
         self.cards = self.getcardlist()
 
         # shuffle cards
-        rand = Random()
+        rand = getrandom(seed)
         rand.shuffle(self.cards)
     
     def __str__(self):
@@ -115,11 +249,7 @@ class Deck:
         """getcardlist() -> list
         Build the list of all cards."""
 
-        cards = []
-        for seed in SEEDS:
-            for value in CARDSNAMES:
-                cards.append(Card(seed, value))
-        return cards
+        return list(CARDS)
 
     def setbriscola(self):
         """Pop the first card from the deck and set the 'briscola'
@@ -146,10 +276,130 @@ class Deck:
         Needed when nplayers == 3.
         """
         for idx, card in enumerate(self.cards):
-            if card.value == 'DUE':
+            if card.rank == RANKIDX['DUE']:
                 self.removedcard = self.cards.pop(idx)
                 break
 
+class CardTracker:
+    """Keeps track of the cards still in play, updated in constant time on
+    each card played or drawn, for the benefit of Player strategies.
+
+    'unplayed' is the bitmask of the ids of the cards in the deck or in a
+    hand, 'seedpoints' the points they are worth for each seed index,
+    'trumps' how many of them are briscola (none without a briscola, as in
+    MazzoAcinque) and 'ndeck' how many cards are left in the deck."""
+
+    def __init__(self, deck, hands):
+        self.briscola = deck.briscola
+        self.trumpseed = None
+        if self.briscola is not None:
+            self.trumpseed = self.briscola.seedidx
+        self.unplayed = 0
+        self.seedpoints = [ 0 ] * NSEEDS
+        self.trumps = 0
+
+        for card in deck.cards + [ card for hand in hands for card in hand ]:
+            self.unplayed |= 1 << card.id
+            self.seedpoints[card.seedidx] += card.points
+            if card.seedidx == self.trumpseed:
+                self.trumps += 1
+
+        self.ndeck = len(deck.cards)
+
+    def played(self, card):
+        """Record that 'card' has been played."""
+        self.unplayed &= ~(1 << card.id)
+        self.seedpoints[card.seedidx] -= card.points
+        if card.seedidx == self.trumpseed:
+            self.trumps -= 1
+
+    def drawn(self, card):
+        """Record that 'card' has been drawn from the deck."""
+        self.ndeck -= 1
+
+    def pointsleft(self):
+        """pointsleft() -> int
+        Return the points still to be won."""
+        return sum(self.seedpoints)
+
+    def unseen(self, player):
+        """unseen(player) -> int
+        Return the bitmask of the cards 'player' has not seen yet: those
+        still in play, but neither in his hand nor the briscola, which is
+        face up until drawn."""
+        mask = self.unplayed
+        if self.briscola is not None:
+            mask &= ~(1 << self.briscola.id)
+        for card in player.hand:
+            mask &= ~(1 << card.id)
+        return mask
+
+class GameStats:
+    """Number of calls and time spent in the phases of one or more games,
+    by phase name. See Game.instrument()."""
+
+    def __init__(self):
+        self.calls = {}
+        self.times = {}
+
+    def timed(self, name, function):
+        """timed(name, function) -> function
+        Return a wrapper of 'function' accounting its calls to 'name'."""
+        # never time the same call twice
+        function = getattr(function, 'wrapped', function)
+        calls, times, clock = self.calls, self.times, time.time
+        calls.setdefault(name, 0)
+        times.setdefault(name, 0.0)
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                times[name] += clock() - start
+                calls[name] += 1
+
+        wrapper.wrapped = function
+        return wrapper
+
+    @staticmethod
+    def untimed(obj, name):
+        """Take away the wrapper set by timed() on the attribute 'name' of
+        the instance 'obj', putting back what it wrapped. Other instance
+        attributes are left alone."""
+        wrapped = getattr(obj.__dict__.get(name), 'wrapped', None)
+        if wrapped is None:
+            return
+
+        del obj.__dict__[name]
+        # a method of the class needs no instance attribute
+        if wrapped != getattr(obj, name):
+            setattr(obj, name, wrapped)
+
+    def merge(self, other):
+        """Add the calls and times collected in another GameStats."""
+        for name, count in other.calls.items():
+            self.calls[name] = self.calls.get(name, 0) + count
+            self.times[name] = self.times.get(name, 0.0) + other.times[name]
+
+    def __str__(self):
+        lines = []
+        for name in sorted(self.calls):
+            calls, seconds = self.calls[name], self.times[name]
+            lines.append("%-16s %10s calls %10.3fs %10.2fus/call" % (name,
+                calls, seconds, 1e6 * seconds / max(calls, 1)))
+        return "\n".join(lines)
+
+def profiled(path, function, *args):
+    """profiled(path, function, *args) -> result
+    Call 'function' under cProfile, dumping the profile to 'path' for the
+    pstats module."""
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args)
+    finally:
+        profile.dump_stats(path)
+
 class MazzoAcinque(Deck):
     def setbriscola(self):
         pass
@@ -162,18 +412,38 @@ class MazzoAcinque(Deck):
 
 class Game:
     """Represents a game instance. Basically, a game is made by a list of
-    players and a deck of cards."""
+    players and a deck of cards. 'players' is a deque, kept in the order of
+    the current trick: the first player leads it."""
     
     nonhumans = ( 'Kano', 'Sub-Zero', 'Scorpion', 'Sonya' )
 
-    def __init__(self, players=None):
+    def __init__(self, players=None, seed=None, stats=None):
         """Create a new game, to be played by the given players. If players is
-        None, call getplayers()."""
+        None, call getplayers(). The deck is shuffled according to 'seed', a
+        seed or a random.Random instance: when None a random seed is chosen,
+        and saved in 'seed' to allow replaying the game. Given a GameStats
+        in 'stats', the game is instrumented, see instrument()."""
+
+        if seed is None:
+            seed = SEEDER.getrandbits(64)
+        self.seed = seed
         
         if players:
             self.players = players
         else:
             self.getplayers()
+        self.players = deque(self.players)
+
+        # let strategies look at the game they are playing
+        for player in self.players:
+            player.game = self
+            # forget the timers of an instrumented game played before
+            for name in ('getchoice', 'aiplaycard'):
+                GameStats.untimed(player, name)
+
+        self.stats = stats
+        if stats is not None:
+            self.instrument(stats)
         
         nplayers = len(self.players)
         
@@ -181,18 +451,20 @@ class Game:
             raise InvalidNumberOfPlayers, nplayers
 
         if nplayers != 5:
-            self.deck = Deck()
+            self.deck = Deck(seed)
             self.ncards = 3
 
             if nplayers == 3:
                 self.deck.removetwo()
         else:
             # XXX: to implement
-            self.deck = MazzoAcinque()
+            self.deck = MazzoAcinque(seed)
             self.ncards = 8
 
         self.givecards()
         self.deck.setbriscola()
+        self.tracker = CardTracker(self.deck,
+                                   [ player.hand for player in self.players ])
 
         self.cardsplayed = []
 
@@ -200,6 +472,19 @@ class Game:
         self.winnerplayer = None
         self.winnerplayers, self.winnerteam = None, None
 
+    def instrument(self, stats):
+        """Account the calls of the game phases in the GameStats 'stats':
+        dealing, playing cards, resolving tricks, the players choices and
+        the final results. Methods are replaced on the instances only, so
+        games that are not instrumented run at full speed."""
+        for name in ('givecards', 'playcard', 'resolvetrick',
+                     'computeresults'):
+            setattr(self, name, stats.timed(name, getattr(self, name)))
+
+        for player in self.players:
+            player.getchoice = stats.timed('getchoice', player.getchoice)
+            player.aiplaycard = stats.timed('aiplaycard', player.aiplaycard)
+
     def getplayer(self, name):
         """getplayer(name) -> Player"""
         for player in self.players:
@@ -211,21 +496,74 @@ class Game:
         Returns a list of 'num' random player names."""
         return sample(self.nonhumans, num)
     
+    def dealtcard(self, player, card):
+        """dealtcard(player, card) -> card
+        Return what to put in the hand of 'player' when he gets 'card'.
+        User interfaces can override this to wrap cards."""
+        return card
+
     def givecards(self):
         """Set player.hand for each Player. player.hand is a list of 'ncards'
         cards."""
         for player in self.players:
-            player.hand = [ self.deck.cards.pop() 
+            player.hand = [ self.dealtcard(player, self.deck.cards.pop())
                 for idx in range(0, self.ncards) ]
     
     def playcard(self, idxplayer, idxcard):
         """Add card identified by 'idxcard' to 'cardsplayed'."""
-        self.cardsplayed.append(self.players[idxplayer].hand.pop(idxcard))
+        card = self.players[idxplayer].hand.pop(idxcard)
+        self.cardsplayed.append(card)
+        self.tracker.played(card)
     
     def resetplayed(self):
         """Empty 'cardsplayed'."""
         self.cardsplayed = []
 
+    def finished(self):
+        """finished() -> boolean
+        Return True when every card has been played and scored."""
+        return not self.cardsplayed and not self.players[0].hand
+
+    def drawcards(self):
+        """Let each player draw a card from the deck, in turn order, as long
+        as there are cards left."""
+        for player in self.players:
+            card = self.deck.draw()
+            if card is None:
+                break
+            self.tracker.drawn(card)
+            player.hand.append(self.dealtcard(player, card))
+
+    def resolvetrick(self):
+        """resolvetrick() -> winner_idx
+
+        Give the points of 'cardsplayed' to the winner of the trick, rotate
+        'players' so that he leads the next one, let everybody draw and
+        empty 'cardsplayed'. Return the index of the winner in the trick."""
+        idxwinner = handwinner(self.cardsplayed, self.deck.briscola, 0, 1)
+        winner = self.players[idxwinner]
+
+        for card in self.cardsplayed:
+            winner.points += card.points
+
+        self.players.rotate(-idxwinner)
+        self.drawcards()
+        self.resetplayed()
+
+        return idxwinner
+
+    def step(self):
+        """step() -> winner_idx
+        Play a whole trick, asking each player for his card with
+        getchoice(), then resolve it. See resolvetrick()."""
+        self.resetplayed()
+
+        for idxplayer, player in enumerate(self.players):
+            idxcard = player.getchoice(self.cardsplayed, self.deck.briscola)
+            self.playcard(idxplayer, idxcard)
+
+        return self.resolvetrick()
+
     def computeresults(self):
         """Compute final results, setting 'winnerplayer' (or 'winnerteam' and
         'winnerplayers') and 'points'."""
@@ -234,13 +572,13 @@ class Game:
 
         if len(self.players) < 4:
             # no teams
-            self.players.sort()
-            for player in self.players:
+            ranking = sorted(self.players)
+            for player in ranking:
                 self.points[player.name] = player.points
             
-            if self.players[-1].points != self.players[-2].points:
+            if ranking[-1].points != ranking[-2].points:
                 # set winnerplayer only if someone actually won
-                self.winnerplayer = self.players[-1]
+                self.winnerplayer = ranking[-1]
             return
 
         # teams
@@ -266,6 +604,7 @@ class Game:
         implemented by the subclassing user interface, here we set 'players' to
         a random list of non-human players."""
         human = False
+        self.players = []
 
         for idx, name in enumerate(self.randomplayernames(4)):
             team = idx % 2 and 'a' or 'b'
@@ -297,7 +636,7 @@ class InvalidNumberOfPlayers(Exception):
     def __str__(self):
         return "Invalid number of players: " + self.nplayers
 
-class Player:
+class Player(object):
     """Represents a player. A player is distinguished by his hand (a list of
     Card objects), his points, his name and is team, where appropriate."""
     
@@ -308,6 +647,8 @@ class Player:
         self.ishuman = ishuman
         self.team = team
         self.number = number
+        # set by Game
+        self.game = None
 
     def __cmp__(self, player2):
         """Compare the points of player and 'player2'."""
@@ -25,7 +25,11 @@
 __revision__ = "20080829"
 
 import sys
+from functools import partial
+from optparse import OptionParser
+
 import briscola
+import montecarlo
 
 def showcard(card):
     return card.value + " of " + card.seed
@@ -59,7 +63,15 @@ class CliPlayer(briscola.Player):
 
         return int(cardidx.replace('\n',''))
 
+class CliMonteCarloPlayer(montecarlo.MonteCarloPlayer, CliPlayer):
+    pass
+
 class CliGame(briscola.Game):
+
+    def __init__(self, players=None, aiplayer=None):
+        """'aiplayer' builds the non-human players, CliPlayer by default."""
+        self.aiplayer = aiplayer or CliPlayer
+        briscola.Game.__init__(self, players)
     
     def getplayers(self):
 
@@ -80,7 +92,7 @@ class CliGame(briscola.Game):
         others = self.randomplayernames(nplayers)
 
         for idx, name in enumerate(others):
-            self.players.append(CliPlayer(name, ishuman=False,
+            self.players.append(self.aiplayer(name, ishuman=False,
                 team=idx % 2 and 'a' or 'b', number=idx+1))
 
     def showplayedcard(self, idxplayer, idxcard):
@@ -108,13 +120,18 @@ class CliGame(briscola.Game):
             for player in self.players:
                 if player.team == self.winnerteam:
                     print player.name, player.points, 'points'
+
+        for player in self.players:
+            if isinstance(player, montecarlo.MonteCarloPlayer):
+                print "%s: %.0f samples/s" % (player.name,
+                                              player.samplespersecond())
     
     def mainloop(self):
         
         if len(self.players) == 3:
             print "Removed card:", showcard(self.deck.removedcard)
 
-        while len(self.players[0].hand):
+        while not self.finished():
             self.resetplayed()
 
             for idxplayer, player in enumerate(self.players):
@@ -132,29 +149,32 @@ class CliGame(briscola.Game):
                     print "press enter..."
                     sys.stdin.readline()
 
-            idxwinner = briscola.handwinner(self.cardsplayed, 
-                                            self.deck.briscola, 0, 1)
-
-            for card in self.cardsplayed:
-                self.players[idxwinner].points += card.points
-            
-            pwinner = self.players[idxwinner]
-
-            while (self.players[0] != pwinner):
-                self.players.append(self.players.pop(0))
-
-            for player in self.players:
-                card = self.deck.draw()
-                if card is not None:
-                    player.hand.append(card)
+            self.resolvetrick()
 
         self.showresults()
        
 if __name__ == "__main__":
 
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-m", "--montecarlo", action="store_true",
+                      help="use Monte Carlo non-human players")
+    parser.add_option("-s", "--samples", type="int", default=200,
+                      help="Monte Carlo samples per move")
+    parser.add_option("-b", "--budget", type="int",
+                      help="Monte Carlo milliseconds per move")
+    parser.add_option("-j", "--processes", type="int", default=1,
+                      help="Monte Carlo worker processes")
+    options, args = parser.parse_args()
+
     print """pryscola v%s""" % __revision__
 
-    game = CliGame()
+    aiplayer = None
+    if options.montecarlo:
+        aiplayer = partial(CliMonteCarloPlayer, samples=options.samples,
+                           budget=options.budget,
+                           processes=options.processes)
+
+    game = CliGame(aiplayer=aiplayer)
     try:
         game.mainloop()
     except KeyboardInterrupt:
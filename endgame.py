@@ -0,0 +1,148 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, exact endgame solver. Once the deck is empty in a two players
+game, both hands are determined by the cards already seen and the rest of
+the game can be solved exactly."""
+
+__revision__ = "20261018"
+
+import briscola
+
+NCARDS = briscola.NCARDS
+IDPOINTS = briscola.IDPOINTS
+BEATS = briscola.BEATS
+
+def handmask(cards):
+    """handmask(cards) -> int
+    Return the bitmask of the ids of the given cards."""
+    mask = 0
+    for card in cards:
+        mask |= 1 << card.id
+    return mask
+
+def maskpoints(mask):
+    """maskpoints(mask) -> int
+    Return the points of the cards in the bitmask 'mask'."""
+    points = 0
+    while mask:
+        low = mask & -mask
+        points += IDPOINTS[low.bit_length() - 1]
+        mask ^= low
+    return points
+
+class EndgameSolver:
+    """Minimax search of two players endgames. Positions are identified by
+    a compact key made of the two hands bitmasks, the card led in the
+    current trick and the briscola seed, and their values are kept in a
+    transposition table holding at most 'maxentries' positions."""
+
+    def __init__(self, maxentries=200000):
+        self.table = {}
+        self.maxentries = maxentries
+
+    def search(self, trump, tomove, other, lead=-1):
+        """search(trump, tomove, other, lead) -> (points, cardid)
+
+        'tomove' and 'other' are the bitmasks of the hands of the player to
+        move and of his opponent, 'lead' the id of the card led by the
+        opponent in the current trick, or -1 if 'tomove' leads. Return the
+        points 'tomove' scores from here on when both players play
+        perfectly, and the id of the card he should play."""
+
+        if not tomove:
+            return 0, None
+
+        key = (lead + 1) << 82 | trump << 80 | other << NCARDS | tomove
+        try:
+            return self.table[key]
+        except KeyError:
+            pass
+
+        # points still to be won, not counting the card already led
+        total = maskpoints(tomove) + maskpoints(other)
+        base = trump * NCARDS * NCARDS
+        best, bestcid = -1, None
+
+        mask = tomove
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            cid = low.bit_length() - 1
+            rest = tomove ^ low
+
+            if lead < 0:
+                # the opponent answers, then the game goes on
+                points = total - self.search(trump, other, rest, cid)[0]
+            elif BEATS[base + lead * NCARDS + cid]:
+                # the opponent takes the trick and leads the next one
+                points = total - IDPOINTS[cid] - \
+                    self.search(trump, other, rest)[0]
+            else:
+                points = IDPOINTS[lead] + IDPOINTS[cid] + \
+                    self.search(trump, rest, other)[0]
+
+            if points > best:
+                best, bestcid = points, cid
+
+        if len(self.table) >= self.maxentries:
+            self.table.clear()
+        self.table[key] = best, bestcid
+
+        return best, bestcid
+
+class EndgamePlayer(briscola.Player):
+    """Non-human player using the exact solver once the deck is empty in a
+    two players game, and aiplaycard() before."""
+
+    # shared by every EndgamePlayer
+    solver = EndgameSolver()
+
+    def inendgame(self):
+        """inendgame() -> boolean
+        Return True if this is a two players game and the deck is empty."""
+        return self.game is not None and len(self.game.players) == 2 and \
+            self.game.deck.nomorecards()
+
+    def endgamechoice(self, cardsplayed, curbriscola):
+        """endgamechoice(cardsplayed, curbriscola) -> cardidx
+        Index of the card to play according to the solver."""
+        for opponent in self.game.players:
+            if opponent is not self:
+                break
+
+        if cardsplayed:
+            lead = cardsplayed[0].id
+        else:
+            lead = -1
+
+        cid = self.solver.search(curbriscola.seedidx, handmask(self.hand),
+                                 handmask(opponent.hand), lead)[1]
+
+        for idx, card in enumerate(self.hand):
+            if card.id == cid:
+                return idx
+
+    def getchoice(self, cardsplayed=None, curbriscola=None):
+        """getchoice(cardsplayed, curbriscola) -> cardidx
+        Solve the endgame, otherwise behave like Player.getchoice()."""
+        if not self.ishuman and curbriscola and len(self.hand) > 1 and \
+                self.inendgame():
+            return self.endgamechoice(cardsplayed, curbriscola)
+
+        return briscola.Player.getchoice(self, cardsplayed, curbriscola)
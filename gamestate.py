@@ -0,0 +1,237 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, compact game positions for search based players."""
+
+__revision__ = "20261018"
+
+from random import Random
+
+import briscola
+
+NCARDS = briscola.NCARDS
+IDPOINTS = briscola.IDPOINTS
+
+# at most six players, see briscola.Game
+MAXPLAYERS = 6
+
+def zobristkeys(seed=1042):
+    """zobristkeys(seed) -> (hand, trick, leader, ndeck, trump)
+    Random 64 bits keys for Zobrist hashing of GameState objects."""
+    rand = Random(seed)
+    key = lambda: rand.getrandbits(64)
+
+    return ([ [ key() for cid in range(NCARDS) ]
+              for seat in range(MAXPLAYERS) ],
+            [ [ key() for cid in range(NCARDS) ]
+              for pos in range(MAXPLAYERS) ],
+            [ key() for seat in range(MAXPLAYERS) ],
+            [ key() for ndeck in range(NCARDS + 1) ],
+            [ key() for trump in range(briscola.NSEEDS) ])
+
+ZHAND, ZTRICK, ZLEADER, ZNDECK, ZTRUMP = zobristkeys()
+
+class GameState(object):
+    """A game position. Seats are numbered in the order of Game.players at
+    conversion time. 'hands' holds a bitmask of card ids for each seat and
+    'deck' the ids of the cards to be drawn, from the end. The deck is
+    never modified, drawing just decrements 'ndeck', so clones share it.
+    'trick' holds the ids played in the current trick, starting from the
+    seat 'leader'. 'seats' holds the players of the converted Game, by
+    seat. 'hash' is a Zobrist hash of everything but the points and the
+    seats, which do not affect the rest of the game."""
+
+    __slots__ = ( 'hands', 'deck', 'ndeck', 'trump', 'briscola', 'leader',
+                  'trick', 'points', 'seats', 'hash', 'history' )
+
+    def __init__(self, hands, deck, ndeck, briscolaid, leader=0, trick=(),
+                 points=None, seats=()):
+        self.hands = list(hands)
+        self.deck = bytearray(deck)
+        self.ndeck = ndeck
+        self.briscola = briscolaid
+        self.trump = briscola.IDSEED[briscolaid]
+        self.leader = leader
+        self.trick = list(trick)
+        self.points = points and list(points) or [ 0 ] * len(self.hands)
+        self.seats = tuple(seats)
+        # undo informations, see apply()
+        self.history = []
+        self.hash = self.computehash()
+
+    def computehash(self):
+        """computehash() -> int
+        Compute the Zobrist hash from scratch."""
+        value = ZLEADER[self.leader] ^ ZNDECK[self.ndeck] ^ ZTRUMP[self.trump]
+
+        for seat, hand in enumerate(self.hands):
+            for cid in range(NCARDS):
+                if hand >> cid & 1:
+                    value ^= ZHAND[seat][cid]
+
+        for pos, cid in enumerate(self.trick):
+            value ^= ZTRICK[pos][cid]
+
+        return value
+
+    def clone(self):
+        """clone() -> GameState
+        Return a copy of this position, without its undo history."""
+        state = GameState.__new__(GameState)
+        state.hands = self.hands[:]
+        state.deck = self.deck
+        state.ndeck = self.ndeck
+        state.briscola = self.briscola
+        state.trump = self.trump
+        state.leader = self.leader
+        state.trick = self.trick[:]
+        state.points = self.points[:]
+        state.seats = self.seats
+        state.hash = self.hash
+        state.history = []
+        return state
+
+    def tomove(self):
+        """tomove() -> int
+        Return the seat of the player who has to play."""
+        return (self.leader + len(self.trick)) % len(self.hands)
+
+    def moves(self):
+        """moves() -> list
+        Return the ids of the cards the player to move can play."""
+        hand = self.hands[self.tomove()]
+        return [ cid for cid in range(NCARDS) if hand >> cid & 1 ]
+
+    def finished(self):
+        """finished() -> boolean
+        Return True if every card has been played."""
+        return not self.trick and not any(self.hands)
+
+    def apply(self, move):
+        """Play the card id 'move' for the player to move. When the trick is
+        complete, score it and let every player draw a card, starting from
+        the winner."""
+        nplayers = len(self.hands)
+        seat = self.tomove()
+
+        self.hands[seat] ^= 1 << move
+        self.hash ^= ZHAND[seat][move] ^ ZTRICK[len(self.trick)][move]
+        self.trick.append(move)
+
+        if len(self.trick) < nplayers:
+            self.history.append((move, None, 0, 0, 0))
+            return
+
+        trick = self.trick
+        winner = (self.leader + briscola.trickwinner(trick, self.trump)) \
+            % nplayers
+        gained = 0
+        for cid in trick:
+            gained += IDPOINTS[cid]
+        self.points[winner] += gained
+
+        for pos, cid in enumerate(trick):
+            self.hash ^= ZTRICK[pos][cid]
+        self.hash ^= ZLEADER[self.leader] ^ ZLEADER[winner]
+
+        drawn = min(nplayers, self.ndeck)
+        self.history.append((move, trick, self.leader, gained, drawn))
+        self.trick = []
+        self.leader = winner
+
+        self.hash ^= ZNDECK[self.ndeck]
+        for turn in range(drawn):
+            self.ndeck -= 1
+            drawer = (winner + turn) % nplayers
+            cid = self.deck[self.ndeck]
+            self.hands[drawer] |= 1 << cid
+            self.hash ^= ZHAND[drawer][cid]
+        self.hash ^= ZNDECK[self.ndeck]
+
+    def undo(self):
+        """Take back the last move applied."""
+        move, trick, leader, gained, drawn = self.history.pop()
+        nplayers = len(self.hands)
+
+        if trick is not None:
+            winner = self.leader
+
+            # put the drawn cards back in the deck, last drawn first
+            self.hash ^= ZNDECK[self.ndeck]
+            for turn in reversed(range(drawn)):
+                drawer = (winner + turn) % nplayers
+                cid = self.deck[self.ndeck]
+                self.hands[drawer] ^= 1 << cid
+                self.hash ^= ZHAND[drawer][cid]
+                self.ndeck += 1
+            self.hash ^= ZNDECK[self.ndeck]
+
+            self.points[winner] -= gained
+            self.hash ^= ZLEADER[winner] ^ ZLEADER[leader]
+            self.leader = leader
+            for pos, cid in enumerate(trick):
+                self.hash ^= ZTRICK[pos][cid]
+            self.trick = trick
+
+        self.trick.pop()
+        seat = self.tomove()
+        self.hands[seat] |= 1 << move
+        self.hash ^= ZHAND[seat][move] ^ ZTRICK[len(self.trick)][move]
+
+    @classmethod
+    def fromgame(cls, game):
+        """fromgame(game) -> GameState
+        Build the position of a live briscola.Game, whose players are
+        expected to be in the order of the current trick."""
+        hands = []
+        for player in game.players:
+            mask = 0
+            for card in player.hand:
+                mask |= 1 << card.id
+            hands.append(mask)
+
+        return cls(hands, [ card.id for card in game.deck.cards ],
+                   len(game.deck.cards), game.deck.briscola.id, 0,
+                   [ card.id for card in game.cardsplayed ],
+                   [ player.points for player in game.players ],
+                   game.players)
+
+    def togame(self, game):
+        """Set up the live briscola.Game 'game', converted with fromgame(),
+        to this position. Players are put back in the order of their seats,
+        starting from the leader of the current trick, whatever order the
+        game is in now; hands are sorted by card id."""
+        seats = self.seats
+        nplayers = len(seats)
+        players = game.players
+        players.clear()
+        players.extend([ seats[(self.leader + pos) % nplayers]
+                         for pos in range(nplayers) ])
+
+        for pos, player in enumerate(players):
+            seat = (self.leader + pos) % nplayers
+            player.hand = [ briscola.idcard(cid) for cid in range(NCARDS)
+                            if self.hands[seat] >> cid & 1 ]
+            player.points = self.points[seat]
+
+        game.deck.cards = [ briscola.idcard(cid)
+                            for cid in self.deck[:self.ndeck] ]
+        game.cardsplayed = [ briscola.idcard(cid) for cid in self.trick ]
+        # the cards in the trick are out of the hands, thus played
+        hands = [ player.hand for player in players ]
+        game.tracker = briscola.CardTracker(game.deck, hands)
@@ -24,49 +24,47 @@
 
 __revision__ = "20080829"
 
-import os
 import sys
+from functools import partial
+from optparse import OptionParser
 
 import pygame
 #from pygame.locals import *
 
 import briscola
+import guicache
 import guimenu
+import montecarlo
 
 XRES = 800
 YRES = 600
 
 class GuiCard(briscola.Card):
-    
-    def __init__(self, seed, value, theme="default", orientation='vertical'):
-        briscola.Card.__init__(self, seed, value)
-        filename = os.path.join(".", "cards", theme, 
-            "%s_%s.gif" % (value.lower(), seed.lower()))
-
-        self.image = pygame.image.load(filename).convert()
-        self.backimage = pygame.image.load(filename).convert()
-
-        filename = os.path.join(".", "cards", theme, "back.gif")
-        self.backimage = pygame.image.load(filename).convert()
 
-        if orientation == 'horizontal':
-            self.image = pygame.transform.rotate(self.image, 90)
-            self.backimage = pygame.transform.rotate(self.backimage, 90)
+    # unlike interned Cards, each GuiCard has its own position
+    __setattr__ = object.__setattr__
+    
+    def __init__(self, seed, value, theme=None, orientation='vertical'):
+        """Images come from guicache.IMAGES, in its current theme if
+        'theme' is None."""
+        self.image = guicache.IMAGES.get(guicache.cardname(seed, value),
+                                         orientation, theme)
+        self.backimage = guicache.IMAGES.get('back', orientation, theme)
         
         self.card_rect = self.image.get_rect()
 
 class GuiPlayer(briscola.Player):
     
     def showname(self, field):
+        """showname(field) -> rect
+        Draw the name of the player on 'field', return where."""
         field_rect = field.get_rect()
 
         playername = self.name 
         #if self.team:
         #    playername += " (team %s)" % self.team
 
-        myfnt = pygame.font.match_font('Arial')
-        font = pygame.font.Font(myfnt, 36)
-        text = font.render(playername, 1, (10, 10, 10))
+        text = guicache.TEXTS.get(playername, 36, (10, 10, 10))
         text_rect = text.get_rect()
 
         if self.number == 0:
@@ -86,8 +84,11 @@ class GuiPlayer(briscola.Player):
             text_rect.y = field_rect.centery + 110
 
         field.blit(text, text_rect)
+        return text_rect
 
     def showhand(self, field):
+        """showhand(field) -> rects
+        Draw the cards of the player on 'field', return where."""
         field_rect = field.get_rect()
 
         for idx, card in enumerate(self.hand):
@@ -113,6 +114,8 @@ class GuiPlayer(briscola.Player):
                 
             field.blit(image, card.card_rect)
 
+        return [ card.card_rect for card in self.hand ]
+
     def getchoice(self, cardsplayed=None, curbriscola=None, event=None):
         """Interactive implementation of getchoice(). event cointains a
         MOUSEBUTTONDOWN event."""
@@ -127,21 +130,39 @@ class GuiPlayer(briscola.Player):
             if card.card_rect.collidepoint(event.pos):
                 return cardidx
 
+class GuiMonteCarloPlayer(montecarlo.MonteCarloPlayer, GuiPlayer):
+    pass
+
 class GuiGame(briscola.Game):
 
-    def __init__(self, players, size):
-        """Set up graphics, build and display the field, put the cards on
-        the field (briscola and deck)."""
+    # frames per second, at most
+    fps = 60
+    # seconds taken by a card to reach the middle of the field, and pixels
+    playtime = 0.4
+    playdistance = 100
+
+    def __init__(self, players, size, aiplayer=None, seed=None):
+        """Set up graphics, build the background with the briscola and the
+        deck and display it. Cards are then drawn on the screen over the
+        background, which is used to erase them, and only the rectangles
+        in 'dirty' are updated, see updatescreen(). 'aiplayer' builds the
+        non-human players, GuiPlayer by default. See briscola.Game for
+        'seed'."""
+
+        self.aiplayer = aiplayer or GuiPlayer
 
         pygame.init()
         self.screen = pygame.display.set_mode(size)
         pygame.display.set_caption("priscola v%s" % __revision__)
                                     #, icontitle=None) 
 
-        briscola.Game.__init__(self, players)
+        # no disk access while dealing
+        guicache.IMAGES.preload()
+
+        briscola.Game.__init__(self, players, seed)
 
-        self.field = self.getfield()
-        field_rect = self.field.get_rect()
+        self.background = self.getfield()
+        field_rect = self.background.get_rect()
         
         # put the briscola on the field
         self.deck.briscola = GuiCard(self.deck.briscola.seed,
@@ -151,23 +172,38 @@ class GuiGame(briscola.Game):
         self.deck.briscola.card_rect.centery = field_rect.centery
         self.deck.briscola.card_rect.centerx = field_rect.centerx
 
-        self.field.blit(self.deck.briscola.image, 
-                        self.deck.briscola.card_rect)
+        self.background.blit(self.deck.briscola.image, 
+                             self.deck.briscola.card_rect)
         
         # put the deck over the curbriscola
-        backimage = self.deck.briscola.backimage
-        backimage = pygame.transform.rotate(backimage, 90)
+        backimage = guicache.IMAGES.get('back', 'vertical')
         backimage_rect = self.deck.briscola.card_rect
         backimage_rect.x -= 15
         backimage_rect.y -= 10
-        self.field.blit(backimage, backimage_rect)
+        self.background.blit(backimage, backimage_rect)
 
-        self.blitscreen()
-
-    def blitscreen(self):
-        # blit everything to the screen
-        self.screen.blit(self.field, (0, 0))
+        self.screen.blit(self.background, (0, 0))
         pygame.display.flip()
+        self.dirty = []
+
+        # the card being played, see showplayedcard()
+        self.animation = None
+        self.animationtime = 0.0
+
+    def draw(self, image, rect):
+        """Draw 'image' on the screen at 'rect'."""
+        self.screen.blit(image, rect)
+        self.dirty.append(rect)
+
+    def erase(self, rect):
+        """Restore the background at 'rect'."""
+        self.screen.blit(self.background, rect, rect)
+        self.dirty.append(rect)
+
+    def updatescreen(self):
+        """Push the rectangles drawn since the last call to the display."""
+        pygame.display.update(self.dirty)
+        self.dirty = []
 
     def getplayers(self):
         # FIXME
@@ -177,174 +213,188 @@ class GuiGame(briscola.Game):
         others = self.randomplayernames(nplayers)
 
         for idx, name in enumerate(others):
-            self.players.append(GuiPlayer(name, ishuman=False,
+            self.players.append(self.aiplayer(name, ishuman=False,
                 team=idx % 2 and 'a' or 'b', number=idx+1))
 
     def getfield(self):
-        """Return a pygame.Surface representing the field."""
+        """Return a pygame.Surface representing the empty field."""
         # field
         field = pygame.Surface(self.screen.get_size())
         field = field.convert()
         field.fill((0, 84, 0))
         return field
    
-    def givecards(self):
-        briscola.Game.givecards(self)
-
-        for player in self.players:
-            hand = player.hand
-            player.hand = []
-            
-            for card in hand:
-                if player.number in (1, 3):
-                    card = GuiCard(card.seed, card.value, orientation='horizontal')
-                else:
-                    card = GuiCard(card.seed, card.value, orientation='vertical')
-                player.hand.append(card)
+    def dealtcard(self, player, card):
+        if player.number in (1, 3):
+            return GuiCard(card.seed, card.value, orientation='horizontal')
+        return GuiCard(card.seed, card.value, orientation='vertical')
     
     def showplayedcard(self, idxplayer, idxcard):
+        """Start moving the card 'idxcard' of the player 'idxplayer' to the
+        middle of the field. It is played when it gets there, see
+        animate()."""
         player = self.players[idxplayer]
         card = player.hand[idxcard]
 
-        #field_rect = self.field.get_rect()
-        
-        for step in range(20):
-            self.field.blit(self.getfield(), card.card_rect, card.card_rect)
-
-            if player.number == 0:
-                card.card_rect = card.card_rect.move(0, -5)
-            elif player.number == 2:
-                card.card_rect = card.card_rect.move(0, 5)
-            elif player.number == 1:
-                card.card_rect = card.card_rect.move(5, 0)
-            elif player.number == 3:
-                card.card_rect = card.card_rect.move(-5, 0)
-            
-            self.field.blit(card.image, card.card_rect)
-            self.blitscreen()
+        dx, dy = { 0: (0, -1), 1: (1, 0),
+                   2: (0, 1), 3: (-1, 0) }[player.number]
+        self.animation = (idxplayer, idxcard, card, card.card_rect,
+                          dx * self.playdistance, dy * self.playdistance)
+        self.animationtime = 0.0
+
+    def animate(self, elapsed):
+        """Move the card being played according to the 'elapsed' seconds,
+        play it at the end of the animation."""
+        idxplayer, idxcard, card, start, dx, dy = self.animation
+        self.animationtime += elapsed
+        progress = min(self.animationtime / self.playtime, 1.0)
+
+        self.erase(card.card_rect)
+        card.card_rect = start.move(int(dx * progress), int(dy * progress))
+        self.draw(card.image, card.card_rect)
+
+        if progress == 1.0:
+            self.animation = None
+            self.playcard(idxplayer, idxcard)
 
     def removefromfield(self):
         for card in self.cardsplayed:
-            self.field.blit(self.getfield(), card.card_rect,
-                            card.card_rect)
-        self.blitscreen()
+            self.erase(card.card_rect)
+        self.updatescreen()
 
     def showresults(self):
         briscola.Game.showresults(self)
 
         if self.winnerplayer or self.winnerteam:
-            myfnt = pygame.font.match_font('Arial')
-            font = pygame.font.Font(myfnt, 36)
-            
             if self.winnerplayer:
-                text = font.render("%s WINS!" % self.winnerplayer.name, 
-                                   1, (10, 10, 10))
+                string = "%s WINS!" % self.winnerplayer.name
             else:
                 string = "%s! For greater justice!" % ' and '.join(
                     [ player.name for player in self.winnerplayers ]
                 )
-                text = font.render(string, 1, (10, 10, 10))
+            text = guicache.TEXTS.get(string, 36, (10, 10, 10))
             
             text_rect = text.get_rect()
 
-            field_rect = self.field.get_rect()
+            field_rect = self.screen.get_rect()
 
             text_rect.centerx = field_rect.centerx
             text_rect.centery = field_rect.centery
 
-            self.field.blit(text, text_rect)
-            self.blitscreen()
+            self.draw(text, text_rect)
+            self.updatescreen()
             
         print self.points
 
-    def mainloop(self):
-        """The main loop. Iterate until the user wants to quit. """
-        
-        while 1:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    sys.exit()
-
-            if not len(self.players[0].hand):
-                break
-
-            self.resetplayed()
-
-            for player in self.players:
-                # show player names and cards
-                player.showname(self.field)
-                player.showhand(self.field)
-
-                self.blitscreen()
-                
-            for idxplayer, player in enumerate(self.players):
-                if player.ishuman:
-                    # wait for card selection
-                    while 1:
-                        event = pygame.event.wait()
-
-                        if event.type == pygame.QUIT:
-                            sys.exit()
+        for player in self.players:
+            if isinstance(player, montecarlo.MonteCarloPlayer):
+                print "%s: %.0f samples/s" % (player.name,
+                                              player.samplespersecond())
 
-                        if event.type == pygame.MOUSEBUTTONDOWN:
-                            cardidx = player.getchoice(self.cardsplayed,
-                                                       self.deck.briscola,
-                                                       event)
-                            if cardidx is not None:
-                                break
+    def showtable(self):
+        """Draw the names and the hands of the players."""
+        for player in self.players:
+            self.dirty.append(player.showname(self.screen))
+            self.dirty.extend(player.showhand(self.screen))
 
-                    self.showplayedcard(idxplayer, cardidx)
-                    self.playcard(idxplayer, cardidx)
+    def click(self, event):
+        """Handle the MOUSEBUTTONDOWN 'event': play the card chosen by a
+        human player, or take the cards of a complete trick off the
+        field."""
+        if self.animation is not None or self.finished():
+            return
 
-                else:
-                    # AI choice
-                    cardidx = player.getchoice(self.cardsplayed,
-                                               self.deck.briscola)
+        if len(self.cardsplayed) == len(self.players):
+            self.removefromfield()
+            self.resolvetrick()
 
-                    self.showplayedcard(idxplayer, cardidx)
-                    self.playcard(idxplayer, cardidx)
+            if self.finished():
+                self.showresults()
+            else:
+                self.showtable()
+            return
 
-                
-            idxwinner = briscola.handwinner(self.cardsplayed, 
-                                            self.deck.briscola, 0, 1)
+        idxplayer = len(self.cardsplayed)
+        player = self.players[idxplayer]
+        if player.ishuman:
+            cardidx = player.getchoice(self.cardsplayed, self.deck.briscola,
+                                       event)
+            if cardidx is not None:
+                self.showplayedcard(idxplayer, cardidx)
+
+    def update(self, elapsed):
+        """Advance the game by 'elapsed' seconds: go on with the animation
+        of the card being played, or let the next non-human player choose
+        his card."""
+        if self.animation is not None:
+            self.animate(elapsed)
+            return
+
+        idxplayer = len(self.cardsplayed)
+        if idxplayer < len(self.players) and not self.finished():
+            player = self.players[idxplayer]
+            if not player.ishuman:
+                self.showplayedcard(idxplayer,
+                    player.getchoice(self.cardsplayed, self.deck.briscola))
+
+    def frame(self, elapsed):
+        """Handle the pending events, advance the game by 'elapsed' seconds
+        and update the screen."""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                sys.exit()
 
-            while 1:
-                event = pygame.event.wait()
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                self.click(event)
 
-                if event.type == pygame.QUIT:
-                    sys.exit()
+        self.update(elapsed)
 
-                if event.type == pygame.MOUSEBUTTONDOWN:
-                    break
+        if self.dirty:
+            self.updatescreen()
 
-            self.removefromfield()
+    def mainloop(self):
+        """The main loop: run frames at most 'fps' times per second, until
+        the user wants to quit."""
+        clock = pygame.time.Clock()
+        self.showtable()
 
-            # FIXME: this stuff should be put in briscola.py
-            for card in self.cardsplayed:
-                self.players[idxwinner].points += card.points
-            
-            pwinner = self.players[idxwinner]
-
-            while (self.players[0] != pwinner):
-                self.players.append(self.players.pop(0))
-
-            for player in self.players:
-                card = self.deck.draw()
-                if card is not None:
-                    if player.number in (1, 3):
-                        card = GuiCard(card.seed, card.value, orientation='horizontal')
-                    else:
-                        card = GuiCard(card.seed, card.value, orientation='vertical')
-                    player.hand.append(card)
-        
-        self.showresults()
         while 1:
-            if pygame.event.wait().type == pygame.QUIT: 
-                sys.exit()
+            # do not jump ahead after a slow frame, e.g. a long AI choice
+            self.frame(min(clock.tick(self.fps), 100) / 1000.0)
 
 if __name__ == "__main__":
 #    menu = Menu(size=(XRES, YRES), options=[ "2", "4" ], 
 #                caption="Number of players")
     
-    game = GuiGame(players=[], size=(XRES, YRES))
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-m", "--montecarlo", action="store_true",
+                      help="use Monte Carlo non-human players")
+    parser.add_option("-s", "--samples", type="int", default=200,
+                      help="Monte Carlo samples per move")
+    parser.add_option("-b", "--budget", type="int",
+                      help="Monte Carlo milliseconds per move")
+    parser.add_option("-j", "--processes", type="int", default=1,
+                      help="Monte Carlo worker processes")
+    parser.add_option("-f", "--fps", type="int", default=GuiGame.fps,
+                      help="frames per second, at most")
+    parser.add_option("-t", "--theme", default="default",
+                      help="card theme, one of: %s" %
+                           ", ".join(guicache.themes()))
+    parser.add_option("--mmap", action="store_true",
+                      help="memory map the sprite atlas of the theme")
+    options, args = parser.parse_args()
+
+    guicache.IMAGES.usemmap = options.mmap
+    if options.theme not in guicache.themes():
+        parser.error("unknown card theme %s" % options.theme)
+    guicache.IMAGES.settheme(options.theme)
+    GuiGame.fps = options.fps
+
+    aiplayer = None
+    if options.montecarlo:
+        aiplayer = partial(GuiMonteCarloPlayer, samples=options.samples,
+                           budget=options.budget,
+                           processes=options.processes)
+
+    game = GuiGame(players=[], size=(XRES, YRES), aiplayer=aiplayer)
     game.mainloop()
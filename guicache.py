@@ -0,0 +1,279 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, caches of pygame surfaces and fonts shared by the graphical
+user interface."""
+
+__revision__ = "20261018"
+
+import json
+import mmap
+import os
+from collections import OrderedDict
+from optparse import OptionParser
+
+import pygame
+
+import briscola
+
+CARDSDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cards")
+
+ORIENTATIONS = ('vertical', 'horizontal')
+
+# sprite atlas files of each theme directory, see buildatlas()
+ATLASPIXELS = "atlas.rgb"
+ATLASINDEX = "atlas.json"
+# width of the atlas, at most
+ATLASWIDTH = 1024
+
+def cardname(seed, value):
+    """cardname(seed, value) -> string
+    Return the name of the image of a card, e.g. 'asso_cuori'."""
+    return "%s_%s" % (value.lower(), seed.lower())
+
+def themes():
+    """themes() -> list
+    Return the names of the card themes, the directories of CARDSDIR."""
+    return sorted([ name for name in os.listdir(CARDSDIR)
+                    if os.path.isdir(os.path.join(CARDSDIR, name)) ])
+
+def imagenames():
+    """imagenames() -> list
+    Return the names of the images of a theme."""
+    return [ cardname(seed, value) for seed in briscola.SEEDS
+             for value in briscola.CARDSNAMES ] + [ 'back' ]
+
+def buildatlas(theme):
+    """Pack the images of 'theme' in a sprite atlas: the ATLASPIXELS file
+    holds the raw RGB pixels, ready for pygame.image.frombuffer(), and the
+    ATLASINDEX file their size and the rectangle of each image. Images are
+    laid out in rows at most ATLASWIDTH pixels wide, and the transparent
+    color of each image is kept in the index."""
+    themedir = os.path.join(CARDSDIR, theme)
+    images = [ (name, pygame.image.load(os.path.join(themedir, name + ".gif")))
+               for name in imagenames() ]
+
+    rects, colorkeys = {}, {}
+    x = y = width = rowheight = 0
+    for name, image in images:
+        imagewidth, imageheight = image.get_size()
+        if x and x + imagewidth > ATLASWIDTH:
+            x, y, rowheight = 0, y + rowheight, 0
+        rects[name] = (x, y, imagewidth, imageheight)
+        x += imagewidth
+        width = max(width, x)
+        rowheight = max(rowheight, imageheight)
+
+    size = (width, y + rowheight)
+    sheet = pygame.Surface(size, 0, 24)
+    for name, image in images:
+        colorkey = image.get_colorkey()
+        if colorkey is not None:
+            # copy the transparent pixels too
+            colorkeys[name] = tuple(colorkey)[:3]
+            image.set_colorkey(None)
+        sheet.blit(image, rects[name][:2])
+
+    pixels = open(os.path.join(themedir, ATLASPIXELS), 'wb')
+    pixels.write(pygame.image.tostring(sheet, 'RGB'))
+    pixels.close()
+
+    index = open(os.path.join(themedir, ATLASINDEX), 'w')
+    json.dump({ 'size': size, 'format': 'RGB', 'rects': rects,
+                'colorkeys': colorkeys }, index, indent=1, sort_keys=True)
+    index.close()
+
+class Atlas:
+    """The sprite atlas of a theme, see buildatlas(). The pixels are read
+    at once, or memory mapped if 'usemmap', and converted to the display
+    format in a single surface, of which images are subsurfaces."""
+
+    def __init__(self, theme, usemmap=False):
+        themedir = os.path.join(CARDSDIR, theme)
+
+        index = open(os.path.join(themedir, ATLASINDEX))
+        info = json.load(index)
+        index.close()
+        size = tuple(info['size'])
+        self.rects = dict((name, pygame.Rect(rect))
+                          for name, rect in info['rects'].items())
+        self.colorkeys = info.get('colorkeys', {})
+
+        pixels = open(os.path.join(themedir, ATLASPIXELS), 'rb')
+        if usemmap:
+            data = mmap.mmap(pixels.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = pixels.read()
+        pixels.close()
+
+        self.sheet = pygame.image.frombuffer(data, size,
+                                             str(info['format'])).convert()
+
+    def get(self, name):
+        """get(name) -> pygame.Surface"""
+        image = self.sheet.subsurface(self.rects[name])
+        if name in self.colorkeys:
+            image.set_colorkey(self.colorkeys[name])
+        return image
+
+    @staticmethod
+    def exists(theme):
+        """exists(theme) -> boolean
+        Return True if the atlas of 'theme' has been built."""
+        themedir = os.path.join(CARDSDIR, theme)
+        return os.path.exists(os.path.join(themedir, ATLASINDEX)) and \
+            os.path.exists(os.path.join(themedir, ATLASPIXELS))
+
+class ImageCache:
+    """Card images, loaded from disk and converted to the display format
+    once, and rotated once for horizontal cards. Images are identified by
+    (theme, name, orientation), where 'name' is a cardname() or 'back', and
+    at most 'maxentries' of them are kept, dropping the least recently
+    used. Surfaces are shared: never draw on them. Images are taken from
+    the sprite atlas of the theme when built, see buildatlas(), memory
+    mapped if 'usemmap'."""
+
+    def __init__(self, maxentries=256, theme="default", usemmap=False):
+        self.maxentries = maxentries
+        self.theme = theme
+        self.usemmap = usemmap
+        self.images = OrderedDict()
+        # Atlas by theme, None for the themes without one
+        self.atlases = {}
+
+    def settheme(self, theme):
+        """Use 'theme' when no theme is given to get()."""
+        if not os.path.isdir(os.path.join(CARDSDIR, theme)):
+            raise ValueError, "unknown card theme %s" % theme
+        self.theme = theme
+
+    def load(self, theme, name):
+        """load(theme, name) -> pygame.Surface
+        Read an image of 'theme' from its atlas, or from its own file."""
+        if theme not in self.atlases:
+            if Atlas.exists(theme):
+                self.atlases[theme] = Atlas(theme, self.usemmap)
+            else:
+                self.atlases[theme] = None
+
+        if self.atlases[theme] is not None:
+            return self.atlases[theme].get(name)
+
+        return pygame.image.load(os.path.join(CARDSDIR, theme,
+                                              name + ".gif")).convert()
+
+    def get(self, name, orientation='vertical', theme=None):
+        """get(name, orientation, theme) -> pygame.Surface"""
+        key = (theme or self.theme, name, orientation)
+
+        try:
+            image = self.images.pop(key)
+        except KeyError:
+            if orientation == 'horizontal':
+                image = pygame.transform.rotate(
+                    self.get(name, 'vertical', key[0]), 90)
+            else:
+                image = self.load(key[0], name)
+
+            if len(self.images) >= self.maxentries:
+                self.images.popitem(last=False)
+
+        # the most recently used image goes last
+        self.images[key] = image
+        return image
+
+    def preload(self, theme=None):
+        """Load every image of 'theme' in both orientations, so that later
+        calls to get() need no disk access."""
+        for name in imagenames():
+            for orientation in ORIENTATIONS:
+                self.get(name, orientation, theme)
+
+    def clear(self):
+        """Forget every image."""
+        self.images.clear()
+        self.atlases.clear()
+
+class FontRegistry:
+    """pygame fonts by (name, size). System fonts are looked up with
+    pygame.font.match_font() once per name, which scans the fonts
+    installed."""
+
+    def __init__(self):
+        self.paths = {}
+        self.fonts = {}
+
+    def get(self, size, name='Arial'):
+        """get(size, name) -> pygame.font.Font"""
+        try:
+            return self.fonts[name, size]
+        except KeyError:
+            pass
+
+        if name not in self.paths:
+            self.paths[name] = pygame.font.match_font(name)
+
+        font = self.fonts[name, size] = pygame.font.Font(self.paths[name],
+                                                         size)
+        return font
+
+class TextCache:
+    """Rendered text surfaces by (text, size, color, font name), keeping at
+    most 'maxentries' of them, dropping the least recently used. Like
+    ImageCache surfaces, they must not be drawn on."""
+
+    def __init__(self, fonts, maxentries=128):
+        self.fonts = fonts
+        self.maxentries = maxentries
+        self.texts = OrderedDict()
+
+    def get(self, text, size, color, name='Arial'):
+        """get(text, size, color, name) -> pygame.Surface"""
+        key = (text, size, tuple(color), name)
+
+        try:
+            surface = self.texts.pop(key)
+        except KeyError:
+            surface = self.fonts.get(size, name).render(text, 1, color)
+
+            if len(self.texts) >= self.maxentries:
+                self.texts.popitem(last=False)
+
+        self.texts[key] = surface
+        return surface
+
+# shared by the whole process
+IMAGES = ImageCache()
+FONTS = FontRegistry()
+TEXTS = TextCache(FONTS)
+
+def main():
+    parser = OptionParser(usage="%prog [theme...]",
+                          version="%%prog %s" % __revision__,
+                          description="Build the sprite atlas of the given "
+                                      "card themes, of every theme if none.")
+    options, args = parser.parse_args()
+
+    for theme in args or themes():
+        if theme not in themes():
+            parser.error("unknown card theme %s" % theme)
+        buildatlas(theme)
+        print "built the atlas of the %s theme" % theme
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,8 @@ __revision__ = "20070920"
 import sys
 import pygame
 
+import guicache
+
 class Menu(object):
 
     """Basic pugame based menu. Even slightly configurable."""
@@ -51,15 +53,26 @@ class Menu(object):
         self.background.fill(self.bgcolor)
         self.background_pos = self.background.get_rect()
         
-        self.font = pygame.font.Font(pygame.font.match_font('Arial'), 36)
-        title = self.font.render(caption, 1, self.textcolor)
+        title = guicache.TEXTS.get(caption, 36, self.textcolor)
         title_pos = title.get_rect()
         title_pos.centerx = self.background_pos.centerx
 
         self.background.blit(title, title_pos)
         
         self.opts = options
-        self.opts_pos = list(range(0, len(options)))
+
+        # normal and hover surfaces of each option, and their positions
+        self.opts_images = []
+        self.opts_pos = []
+        for idx, opt in enumerate(options):
+            images = (guicache.TEXTS.get(opt, 36, self.textcolor),
+                      guicache.TEXTS.get(opt, 36, self.overcolor))
+            opt_pos = images[0].get_rect()
+            opt_pos.centerx = self.background_pos.centerx
+            opt_pos.y = 60 + idx * 60
+
+            self.opts_images.append(images)
+            self.opts_pos.append(opt_pos)
         
         self.over = None
         self.choosen = self.getchoice()
@@ -70,62 +83,59 @@ class Menu(object):
             if opt_pos.collidepoint(cursor_pos):
                 return idx
     
-    def drawopt(self, idx, color):
-        """Draw self.opts[idx]"""
-
-        opt = self.font.render(self.opts[idx], 1, color)
-        opt_pos = opt.get_rect()
-        opt_pos.centerx = self.background_pos.centerx
-        opt_pos.y = 60 + idx * 60
-        # update self.opts_pos[idx] position
-        self.opts_pos[idx] = opt_pos
-        
-        cover = pygame.Surface((opt_pos.width, opt_pos.height))
-        cover.fill(self.bgcolor)
-        cover_pos = cover.get_rect()
-        cover_pos.x, cover_pos.y = opt_pos.x, opt_pos.y
-        self.background.blit(cover, cover_pos)
+    def drawopt(self, idx, over=False):
+        """drawopt(idx, over) -> rect
+        Draw self.opts[idx] on the screen, highlighted if 'over', and
+        return where."""
+        opt_pos = self.opts_pos[idx]
 
-        # now we can blit the option
-        self.background.blit(opt, opt_pos)
+        self.screen.blit(self.background, opt_pos, opt_pos)
+        self.screen.blit(self.opts_images[idx][bool(over)], opt_pos)
+
+        return opt_pos
 
     def drawopts(self):
-        """Draw every option available in self.opts"""
+        """Draw the whole menu"""
+        self.screen.blit(self.background, (0, 0))
+
         for idx in range(len(self.opts)):
-            if idx == self.over:
-                self.drawopt(idx, self.overcolor)
-            else:
-                self.drawopt(idx, self.textcolor)
+            self.drawopt(idx, idx == self.over)
 
-        self.screen.blit(self.background, (0, 0))
         pygame.display.flip()
 
     def getchoice(self):
         """getchoice() -> choice_idx
         
-        Show a graphical menu and return user choice."""
+        Show a graphical menu and return user choice. Waiting for events
+        takes no CPU, and when the pointer moves only the options whose
+        highlighting changes are drawn again."""
 
         self.drawopts()
 
         while True:
-   
-            for event in pygame.event.get():
+            # handle every pending event at once
+            events = [ pygame.event.wait() ] + pygame.event.get()
+            over = self.over
+
+            for event in events:
                 if event.type == pygame.QUIT: 
                     sys.exit()
 
-            event = pygame.event.wait()
-
-            if event.type == pygame.QUIT: 
-                sys.exit()
+                if event.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN):
+                    over = self.isover(event.pos)
 
-            if event.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN):
-                self.over = self.isover(event.pos)
+                if over is not None and event.type == pygame.MOUSEBUTTONDOWN:
+                    return over
 
-            if self.over is not None and event.type == pygame.MOUSEBUTTONDOWN:
-                return self.over
+            if over != self.over:
+                rects = []
+                if self.over is not None:
+                    rects.append(self.drawopt(self.over))
+                if over is not None:
+                    rects.append(self.drawopt(over, True))
 
-            if event.type == pygame.MOUSEMOTION:
-                self.drawopts()
+                self.over = over
+                pygame.display.update(rects)
 
 if __name__ == "__main__":
 
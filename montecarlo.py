@@ -0,0 +1,247 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, determinized Monte Carlo player. The unseen cards are dealt at
+random to the opponents and to the deck many times, and each of these
+deals is played until the end with a fast greedy policy."""
+
+__revision__ = "20261018"
+
+import time
+from multiprocessing import Pool
+from random import Random
+
+import briscola
+
+IDPOINTS = briscola.IDPOINTS
+
+# worker pools, by number of processes
+POOLS = {}
+
+def getpool(processes):
+    """getpool(processes) -> multiprocessing.Pool
+    Return a pool of 'processes' workers, shared by every player."""
+    if processes not in POOLS:
+        POOLS[processes] = Pool(processes)
+    return POOLS[processes]
+
+def greedychoice(hand, trick, trump):
+    """greedychoice(hand, trick, trump) -> cardidx
+    Player.aiplaycard() on card ids: 'hand' is sorted in place by points
+    like aiplaycard() does."""
+    if not trick or len(hand) == 1:
+        return 0
+
+    hand.sort(key=IDPOINTS.__getitem__)
+    winnerid = trick[briscola.trickwinner(trick, trump)]
+    winnerseed, winnerpoints = briscola.IDSEED[winnerid], IDPOINTS[winnerid]
+
+    for idx, cid in enumerate(hand):
+        seed = briscola.IDSEED[cid]
+        if (winnerseed == seed and winnerpoints < IDPOINTS[cid]) or \
+           (winnerpoints > 0 and winnerseed != trump and seed == trump):
+            return idx
+
+    return 0
+
+def playout(hands, deck, trick, trump):
+    """playout(hands, deck, trick, trump) -> list
+    Play a game until the end with greedychoice(). 'hands' holds the hands
+    of the players in the order they play the current trick, in which the
+    cards in 'trick' have already been played. Cards are drawn from the
+    end of 'deck'. Return the points won by each player. Every argument is
+    modified."""
+    nplayers = len(hands)
+    order = range(nplayers)
+    points = [ 0 ] * nplayers
+
+    while True:
+        for seat in order[len(trick):]:
+            hand = hands[seat]
+            trick.append(hand.pop(greedychoice(hand, trick, trump)))
+
+        winner = order[briscola.trickwinner(trick, trump)]
+        for cid in trick:
+            points[winner] += IDPOINTS[cid]
+
+        idx = order.index(winner)
+        order = order[idx:] + order[:idx]
+
+        for seat in order:
+            if deck:
+                hands[seat].append(deck.pop())
+
+        if not hands[winner]:
+            return points
+
+        trick = []
+
+def runsamples(job):
+    """runsamples(job) -> (totals, nsamples)
+
+    Sample deals of the unseen cards and play each candidate card on them.
+    'job' is a tuple (position, nsamples, deadline, seed), see
+    MonteCarloPlayer.position(). Stop after 'nsamples' samples or when
+    time.time() reaches 'deadline', whichever comes first; either of them
+    can be None. Return the
+    points won by our side for each card of our hand, summed over the
+    samples, and the number of samples."""
+    position, nsamples, deadline, seed = job
+    myhand, sizes, known, unseen, briscolaid, ndeck, trick, trump, \
+        myseat, side = position
+
+    rand = Random(seed)
+    totals = [ 0 ] * len(myhand)
+    count = 0
+
+    while (nsamples is None or count < nsamples) and \
+            (deadline is None or time.time() < deadline):
+        cards = list(unseen)
+        rand.shuffle(cards)
+
+        hands = []
+        for seat, size in enumerate(sizes):
+            if seat == myseat:
+                hands.append(None)
+                continue
+            hand = list(known[seat])
+            while len(hand) < size:
+                hand.append(cards.pop())
+            hands.append(hand)
+
+        if ndeck:
+            # the briscola is the last card drawn
+            deck = [ briscolaid ] + cards[:ndeck - 1]
+        else:
+            deck = []
+
+        for idx in range(len(myhand)):
+            sample = [ hand and list(hand) for hand in hands ]
+            sample[myseat] = myhand[:idx] + myhand[idx + 1:]
+            points = playout(sample, list(deck), trick + [ myhand[idx] ],
+                             trump)
+            totals[idx] += sum([ points[seat] for seat in side ])
+
+        count += 1
+
+    return totals, count
+
+class MonteCarloPlayer(briscola.Player):
+    """Non-human player choosing the card with the best average outcome over
+    random deals of the unseen cards. Each decision plays at most 'samples'
+    deals and lasts at most 'budget' milliseconds: either of them can be
+    None, but not both. Samples are run by a pool of 'processes' workers, in
+    this process if 1. Deals are drawn according to 'seed', see
+    briscola.getrandom(): seeded players limited by 'samples' only make the
+    same choices in the same games."""
+
+    def __init__(self, name, ishuman=False, team=None, number=0,
+                 samples=200, budget=None, processes=1, seed=None):
+        briscola.Player.__init__(self, name, ishuman, team, number)
+        self.samples = samples
+        self.budget = budget
+        self.processes = processes
+        self.rand = briscola.getrandom(seed)
+
+        # totals over every decision, see samplespersecond()
+        self.nsamples = 0
+        self.searchtime = 0.0
+
+    def samplespersecond(self):
+        """samplespersecond() -> float"""
+        if not self.searchtime:
+            return 0.0
+        return self.nsamples / self.searchtime
+
+    def seat(self):
+        """seat() -> int
+        Return our index in the players of the game."""
+        for idx, player in enumerate(self.game.players):
+            if player is self:
+                return idx
+
+    def position(self, cardsplayed, curbriscola):
+        """position(cardsplayed, curbriscola) -> tuple
+        Describe the game as seen by this player: our hand, the hand sizes
+        of each player in turn order, the cards known to be in the other
+        hands, the unseen cards, the briscola, the number of cards in the
+        deck, the current trick, the briscola seed, our seat and the seats
+        of our side."""
+        players = self.game.players
+        myseat = self.seat()
+        briscolaid = curbriscola.id
+        sizes = [ len(player.hand) for player in players ]
+        known = [ [ card.id for card in player.hand
+                    if card.id == briscolaid ] for player in players ]
+
+        mask = self.game.tracker.unseen(self)
+        unseen = [ cid for cid in range(briscola.NCARDS) if mask >> cid & 1 ]
+
+        if len(players) < 4:
+            side = [ myseat ]
+        else:
+            side = [ seat for seat, player in enumerate(players)
+                     if player.team == self.team ]
+
+        return ([ card.id for card in self.hand ], sizes, known, unseen,
+                briscolaid, len(self.game.deck.cards),
+                [ card.id for card in cardsplayed ], curbriscola.seedidx,
+                myseat, side)
+
+    def montecarlochoice(self, cardsplayed, curbriscola):
+        """montecarlochoice(cardsplayed, curbriscola) -> cardidx"""
+        start = time.time()
+        position = self.position(cardsplayed or [], curbriscola)
+
+        if self.budget is None:
+            deadline = None
+        else:
+            deadline = start + self.budget / 1000.0
+
+        if self.processes == 1:
+            results = [ runsamples((position, self.samples, deadline,
+                                    self.rand.random())) ]
+        else:
+            share = self.samples and -(-self.samples // self.processes)
+            jobs = [ (position, share, deadline, self.rand.random())
+                     for idx in range(self.processes) ]
+            results = getpool(self.processes).map(runsamples, jobs, 1)
+
+        totals = [ 0 ] * len(self.hand)
+        for partial, count in results:
+            self.nsamples += count
+            for idx, points in enumerate(partial):
+                totals[idx] += points
+
+        self.searchtime += time.time() - start
+
+        return totals.index(max(totals))
+
+    def getchoice(self, cardsplayed=None, curbriscola=None):
+        """getchoice(cardsplayed, curbriscola) -> cardidx
+        Monte Carlo choice for non-human players with more than a card."""
+        if self.ishuman or len(self.hand) < 2 or self.game is None or \
+                not curbriscola:
+            return briscola.Player.getchoice(self, cardsplayed, curbriscola)
+
+        if self.seat() != len(cardsplayed or []):
+            # the game is not played in turn order, so the samples would be
+            # meaningless
+            return briscola.Player.getchoice(self, cardsplayed, curbriscola)
+
+        return self.montecarlochoice(cardsplayed, curbriscola)
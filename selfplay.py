@@ -0,0 +1,247 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, headless self-play. Play many AI-only games, sharded across a
+pool of processes, and report aggregate results."""
+
+__revision__ = "20261018"
+
+import math
+import os
+import time
+from multiprocessing import Pool, cpu_count
+from optparse import OptionParser
+
+import briscola
+
+# points available in a whole game
+TOTALPOINTS = 120
+
+class HeadlessGame(briscola.Game):
+    """A game played by non-human players only, without any user
+    interface."""
+
+    def __init__(self, nplayers, seed=None, stats=None):
+        players = [ briscola.Player(name, ishuman=False,
+                                    team=idx % 2 and 'b' or 'a', number=idx)
+                    for idx, name in enumerate(self.nonhumans[:nplayers]) ]
+        briscola.Game.__init__(self, players, seed, stats)
+
+    def mainloop(self):
+        """Play the whole game, then compute results."""
+
+        while not self.finished():
+            self.step()
+
+        self.showresults()
+
+class SelfPlayStats:
+    """Aggregate results of the games played with a given number of
+    players. Wins are counted per seat, or per team in four players games,
+    while 'points' holds, for each seat, how many games ended with a given
+    score. 'timing' is a briscola.GameStats if the games are timed."""
+
+    def __init__(self, nplayers, timing=False):
+        self.nplayers = nplayers
+        self.timing = timing and briscola.GameStats() or None
+        self.games = 0
+        self.draws = 0
+        self.wins = {}
+        self.points = [ [ 0 ] * (TOTALPOINTS + 1) for idx in range(nplayers) ]
+
+    def add(self, game):
+        """Add the results of a finished HeadlessGame."""
+        self.games += 1
+
+        for player in game.players:
+            self.points[player.number][player.points] += 1
+
+        if game.winnerplayer:
+            winner = game.winnerplayer.number
+        elif game.winnerteam:
+            winner = game.winnerteam
+        else:
+            self.draws += 1
+            return
+
+        self.wins[winner] = self.wins.get(winner, 0) + 1
+
+    def merge(self, other):
+        """Add the results collected in another SelfPlayStats."""
+        self.games += other.games
+        self.draws += other.draws
+
+        if other.timing is not None:
+            if self.timing is None:
+                self.timing = briscola.GameStats()
+            self.timing.merge(other.timing)
+
+        for winner, count in other.wins.items():
+            self.wins[winner] = self.wins.get(winner, 0) + count
+
+        for seat, histogram in enumerate(other.points):
+            for points, count in enumerate(histogram):
+                self.points[seat][points] += count
+
+    def seatpoints(self, seat):
+        """seatpoints(seat) -> (mean, stddev, min, max)
+        Summary of the points distribution of the given seat."""
+        histogram = self.points[seat]
+        scores = [ points for points, count in enumerate(histogram) if count ]
+
+        if not scores:
+            return 0, 0, 0, 0
+
+        mean = sum([ points * count
+                     for points, count in enumerate(histogram) ]) \
+            / float(self.games)
+        variance = sum([ (points - mean) ** 2 * count
+                         for points, count in enumerate(histogram) ]) \
+            / float(self.games)
+
+        return mean, math.sqrt(variance), scores[0], scores[-1]
+
+    def __str__(self):
+        lines = [ "%s players: %s games, %s draws (%.2f%%)" % (
+            self.nplayers, self.games, self.draws,
+            100.0 * self.draws / max(self.games, 1)) ]
+
+        for winner in sorted(self.wins):
+            if self.nplayers < 4:
+                label = "seat %s" % winner
+            else:
+                label = "team %s" % winner
+
+            lines.append("  %s wins: %s (%.2f%%)" % (label, self.wins[winner],
+                100.0 * self.wins[winner] / self.games))
+
+        for seat in range(self.nplayers):
+            lines.append("  seat %s points: mean %.2f stddev %.2f "
+                         "min %s max %s" % ((seat, ) + self.seatpoints(seat)))
+
+        if self.timing is not None:
+            lines.append(str(self.timing))
+
+        return "\n".join(lines)
+
+def playgames(job):
+    """playgames((nplayers, first, ngames, seed, timing, profiledir))
+        -> SelfPlayStats
+    Play games from 'first' to 'first + ngames' of the series identified by
+    'seed' (see briscola.gameseed()), or random games if 'seed' is None,
+    with 'nplayers' players. If 'timing' the game phases are timed, and if
+    'profiledir' is not None each game is profiled there. This is the
+    function run by each worker of the pool."""
+    nplayers, first, ngames, seed, timing, profiledir = job
+    stats = SelfPlayStats(nplayers, timing)
+
+    for idx in xrange(first, first + ngames):
+        if seed is None:
+            game = HeadlessGame(nplayers, stats=stats.timing)
+        else:
+            game = HeadlessGame(nplayers, briscola.gameseed(seed, idx),
+                                stats.timing)
+
+        if profiledir is None:
+            game.mainloop()
+        else:
+            briscola.profiled(os.path.join(profiledir, "game-%s-%s.pstats" %
+                                           (nplayers, idx)), game.mainloop)
+        stats.add(game)
+
+    return stats
+
+def shard(nplayers, ngames, chunksize, seed=None, timing=False,
+          profiledir=None):
+    """shard(nplayers, ngames, chunksize, seed, timing, profiledir) -> list
+    Split 'ngames' games in jobs of at most 'chunksize' games."""
+    return [ (nplayers, first, min(chunksize, ngames - first), seed, timing,
+              profiledir)
+             for first in range(0, ngames, chunksize) ]
+
+def selfplay(ngames, playercounts=(2, 3, 4), processes=None, chunksize=500,
+             seed=None, timing=False, profiledir=None):
+    """selfplay(ngames, playercounts, processes, chunksize, seed, timing,
+                profiledir) -> dict
+    Play 'ngames' games for each number of players in 'playercounts' on a
+    pool of 'processes' workers. Given a 'seed', the same games are played
+    whatever the number of workers. See playgames() for 'timing' and
+    'profiledir'. Return a dictionary mapping each number of players to its
+    SelfPlayStats."""
+    results = dict((nplayers, SelfPlayStats(nplayers))
+                   for nplayers in playercounts)
+
+    jobs = []
+    for nplayers in playercounts:
+        jobs.extend(shard(nplayers, ngames, chunksize, seed, timing,
+                          profiledir))
+
+    if processes == 1:
+        partials = map(playgames, jobs)
+    else:
+        pool = Pool(processes)
+        try:
+            partials = pool.map(playgames, jobs, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+    for stats in partials:
+        results[stats.nplayers].merge(stats)
+
+    return results
+
+def main():
+    parser = OptionParser(usage="%prog [options]",
+                          version="%%prog %s" % __revision__)
+    parser.add_option("-n", "--games", type="int", default=1000,
+                      help="games to play for each number of players")
+    parser.add_option("-p", "--players", default="2,3,4",
+                      help="comma separated numbers of players")
+    parser.add_option("-j", "--processes", type="int", default=cpu_count(),
+                      help="number of worker processes")
+    parser.add_option("-c", "--chunksize", type="int", default=500,
+                      help="games played by a worker per job")
+    parser.add_option("-s", "--seed", type="long",
+                      help="seed of the series of games, to replay them")
+    parser.add_option("-t", "--timing", action="store_true",
+                      help="report the time spent in each game phase")
+    parser.add_option("--profile", metavar="DIR",
+                      help="profile each game, writing pstats files in DIR")
+    options, args = parser.parse_args()
+
+    playercounts = [ int(nplayers) for nplayers in options.players.split(',') ]
+    for nplayers in playercounts:
+        if nplayers not in (2, 3, 4):
+            parser.error("only 2, 3 or 4 players games are supported")
+
+    start = time.time()
+    results = selfplay(options.games, playercounts, options.processes,
+                       max(options.chunksize, 1), options.seed,
+                       options.timing, options.profile)
+    elapsed = time.time() - start
+
+    for nplayers in playercounts:
+        print results[nplayers]
+
+    total = options.games * len(playercounts)
+    print "%s games in %.2fs (%.0f games/s)" % (total, elapsed,
+                                               total / max(elapsed, 1e-9))
+
+if __name__ == "__main__":
+    main()
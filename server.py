@@ -22,153 +22,65 @@
 
 __revision__ = "20071223"
 
+from optparse import OptionParser
+
 from twisted.internet import protocol, reactor
 from twisted.protocols import basic
-import briscola
+import session
+import tables
 
 class BriscolaProtocol(basic.LineReceiver):
-    cmds = [ 
-            'help', 'quit', 'start', 'players', 
-            'hand', 'field', 'play #', 'handwinner',
-           ]
+    """Twisted transport of session.Session."""
 
     def connectionMade(self):
-        self.playername = None
-        self.transport.write("username -> ")
+        self.session = session.Session(self.factory.registry,
+                                       self.transport.write)
+        self.transport.write(self.session.greeting())
 
-    def lineReceived(self, line):
-        if line == 'quit':
+    def dataReceived(self, data):
+        """Answer all the lines in 'data' with a single write."""
+        self.lines = []
+        basic.LineReceiver.dataReceived(self, data)
+
+        if self.lines:
+            self.transport.write(self.session.receivelines(self.lines))
+
+        if self.session.closed:
             self.transport.loseConnection()
 
-        if line == 'help':
-            self.transport.write("Commands: \n%s\n\n" % "\n".join(self.cmds))
-            return
-            
-        if not self.playername:
-            self.playername = line
-            self.factory.addPlayer(line)
-            self.transport.write("Hello %s\n" % line)
-            return
-
-        if line == 'start':
-            self.factory.start()
-            return
-
-        if line == 'players':
-            self.transport.write(self.factory.showPlayers())
-            return
-
-        if line == 'hand':
-            self.transport.write(self.factory.showHand(self.playername))
-            return
-
-        if line.startswith('play'):
-            self.transport.write(
-                self.factory.playCard(self.playername, line)
-            )
-            return
-
-        if line == 'field':
-            self.transport.write(self.factory.showField())
-            return
-
-        if line == 'handwinner':
-            self.transport.write(self.factory.showHandWinner())
-            return
+    def lineReceived(self, line):
+        self.lines.append(line)
 
     def connectionLost(self, reason):
-        self.factory.delPlayer(self.playername)
+        self.session.disconnect()
 
 
 class BriscolaFactory(protocol.ServerFactory):
+    """Any number of tables, each playing its own game, see
+    tables.TableRegistry. Players log in to the lobby, and can then create
+    a table or join one."""
 
     protocol = BriscolaProtocol
     
-    def __init__(self):
-        self.game = None
-        self.players = []
-        # id of the current player
-        self.curplayer = 0
-        self.handwinner = None
-
-    def __getplayeridx(self, player):
-        return self.players.index(player)
-
-    def addPlayer(self, player):
-        self.players.append(player)
-
-    def delPlayer(self, player):
-        self.players.remove(player)
-    
-    def showPlayers(self):
-        return " ".join(self.players) + "\n"
-
-    def start(self):
-        players = [ briscola.Player(name) for name in self.players ]
-        self.game = briscola.Game(players)
-
-    def showHand(self, player):
-        if not self.game: 
-            return "\n"
-
-        hand = " ".join([ "%s: %s di %s" % (idx, card.value, card.seed)
-         for idx, card in enumerate(self.game.getplayer(player).hand) ]) 
-
-        return hand + "\n"
-
-    def playCard(self, player, line):
-        if not self.game: 
-            return "\n"
-
-        playeridx = self.__getplayeridx(player)
-
-        if playeridx != self.curplayer:
-            return "Not your turn!\n"
-
-        cardidx = int(line.split()[1])
-        self.game.playcard(playeridx, cardidx)
-        
-        if len(self.game.cardsplayed) != len(self.players):
-            self.handwinner = None
-        else:
-            # no players left
-            self.handwinner = briscola.handwinner(self.game.cardsplayed,
-                self.game.deck.briscola, 0, 1)
-
-            for card in self.game.cardsplayed:
-                self.game.players[self.handwinner].points += card.points
-
-            winner = self.game.players[self.handwinner]
-            while self.game.players != winner:
-                self.game.players.append(self.game.players.pop(0))
-            
-            for player in self.game.players:
-                card = self.game.deck.draw()
-                if card:
-                    player.hand.append(card)
-        
-        self.curplayer = (playeridx + 1) % len(self.players)
-        return "%s played\n" % cardidx
-
-    def showField(self):
-        if not self.game: 
-            return "\n"
-
-        briscola = self.game.deck.briscola
-        field = "turn: %s briscola: %s of %s " % (
-            self.game.players[self.curplayer].name,
-            briscola.value, briscola.seed
-        )
-
-        for idxcard, card in enumerate(self.game.cardsplayed):
-            field += "%s: %s di %s" % (idxcard, card.value, card.seed)
-
-        return field + "\n"
-
-    def showHandWinner(self):
-        return self.handwinner and "%s\n" % self.handwinner or "\n"
-
+    def __init__(self, samples=tables.BOTSAMPLES, budget=tables.BOTBUDGET):
+        self.registry = tables.TableRegistry(samples, budget)
+
+
+def main():
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("-p", "--port", type="int", default=1042,
+                      help="port to listen on")
+    parser.add_option("-s", "--samples", type="int",
+                      default=tables.BOTSAMPLES,
+                      help="Monte Carlo samples per bot move")
+    parser.add_option("-b", "--budget", type="int",
+                      default=tables.BOTBUDGET,
+                      help="Monte Carlo milliseconds per bot move")
+    options, args = parser.parse_args()
+
+    reactor.listenTCP(options.port, BriscolaFactory(options.samples,
+                                                    options.budget))
+    reactor.run()
 
 if __name__ == "__main__":
-    reactor.listenTCP(1042, BriscolaFactory())
-    reactor.run()
+    main()
@@ -0,0 +1,485 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, the line protocol of the game server, whatever the network
+transport. A Session handles the lines received on a connection and
+returns the replies to send back.
+
+Clients start in text mode, meant for humans. Bots can switch to machine
+mode with the 'machine' command: from then on each line is a JSON object
+such as {"id": 1, "cmd": "play", "args": [0]}, answered by one line such
+as {"id": 1, "ok": true, "result": ...}, or {"id": 1, "ok": false,
+"error": "..."}. Results are structured, and 'play' also returns the new
+hand and field so that bots need not ask for them.
+
+The events of the table a player sits at or watches (see tables.Table)
+are pushed to him as they happen, as lines starting with "* " in text
+mode, and as {"event": "played", "version": 12, "data": {...}} in machine
+mode.
+
+The views of the table (players, hand and field) are rendered once per
+version of the table. They can be requested conditionally, with "hand 12"
+in text mode or {"cmd": "hand", "since": 12} in machine mode: if the table
+is still at version 12, the reply is just "unchanged", or {"ok": true,
+"version": 12, "unchanged": true}."""
+
+__revision__ = "20261018"
+
+import json
+
+import briscola
+import tables
+
+def parsenumber(args, cmd):
+    """parsenumber(args, cmd) -> int
+    Return the number argument of 'cmd'."""
+    try:
+        return int(args[0])
+    except (IndexError, TypeError, ValueError):
+        raise tables.TableError, "usage: %s #" % cmd
+
+def tostr(value):
+    """tostr(value) -> str
+    Return the string 'value' encoded in UTF-8: json.loads() gives unicode,
+    while transports write bytes."""
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if not isinstance(value, str):
+        raise TypeError, "not a string: %r" % (value, )
+    return value
+
+def carddata(card):
+    """carddata(card) -> dict
+    Return 'card' as a JSON object."""
+    return { 'id': card.id, 'value': card.value, 'seed': card.seed,
+             'points': card.points }
+
+def jsondata(data):
+    """jsondata(data) -> data
+    Return 'data' with its cards as JSON objects."""
+    if isinstance(data, briscola.Card):
+        return carddata(data)
+    if isinstance(data, dict):
+        return dict((key, jsondata(value)) for key, value in data.items())
+    if isinstance(data, (list, tuple)):
+        return [ jsondata(value) for value in data ]
+    return data
+
+def showcard(card):
+    return "%s di %s" % (card.value, card.seed)
+
+def showresults(results):
+    return "game over: %s\n" % " ".join([ "%s %s" % (name, points)
+                                          for name, points in results ])
+
+def jsonevent(event):
+    """jsonevent(event) -> line
+    Format a tables.Event for machine mode."""
+    return json.dumps({ 'event': event.name, 'version': event.version,
+                        'data': jsondata(event.data) }) + "\n"
+
+def textevent(event):
+    """textevent(event) -> line
+    Format a tables.Event for humans."""
+    data = event.data
+
+    if event.name == 'start':
+        text = "game started, briscola: %s, turn: %s" % (
+            showcard(data['briscola']), data['turn'])
+    elif event.name == 'dealt':
+        text = "dealt: %s" % ", ".join([ showcard(card)
+                                         for card in data['cards'] ])
+    elif event.name == 'played':
+        text = "%s played %s" % (data['player'], showcard(data['card']))
+    elif event.name == 'trick':
+        text = "%s won the trick, %s points" % (data['winner'],
+                                                data['points'])
+    elif event.name == 'over':
+        return "* " + showresults(data['results'])
+    else:
+        text = event.name
+
+    return "* %s\n" % text
+
+class Session:
+    """A connection to the server, sharing the tables of 'registry' with
+    the others. The first line received is the name of the player, or
+    'machine' to switch to machine mode first; machine mode clients log
+    in with the 'login' command. push(data) sends the events happening
+    while no line is being handled."""
+
+    cmds = [
+            'help', 'quit', 'machine', 'tables', 'create', 'join #', 'leave',
+            'start', 'players [#]', 'hand [#]', 'field [#]', 'play #',
+            'handwinner', 'bot', 'watch #', 'version',
+           ]
+    names = set([ cmd.split()[0] for cmd in cmds ])
+    # commands whose replies are memoized, see tables.Table.view()
+    views = set([ 'players', 'hand', 'field' ])
+
+    def __init__(self, registry, push=None):
+        self.registry = registry
+        self.push = push
+        self.playername = None
+        self.machine = False
+        # set once the connection has to be closed
+        self.closed = False
+        # replies and events to send, while handling lines
+        self.replies = None
+
+    def greeting(self):
+        """greeting() -> string
+        Return what to send when the connection is made."""
+        return "username -> "
+
+    def receivelines(self, lines):
+        """receivelines(lines) -> reply
+        Handle a batch of lines read at once, return all the replies
+        together, so that they can be sent with a single write. Events
+        caused by the lines come before the reply to each of them."""
+        self.replies = []
+        try:
+            for line in lines:
+                if self.closed:
+                    break
+                self.replies.append(self.handle(line))
+        finally:
+            replies, self.replies = self.replies, None
+        return "".join(replies)
+
+    def receive(self, line):
+        """receive(line) -> reply"""
+        return self.receivelines([ line ])
+
+    def notify(self, event):
+        """Send the tables.Event 'event', with the replies if lines are
+        being handled, at once otherwise."""
+        data = event.serialize(self.machine and jsonevent or textevent)
+        if self.replies is not None:
+            self.replies.append(data)
+        elif self.push is not None:
+            self.push(data)
+
+    def handle(self, line):
+        """handle(line) -> reply"""
+        if self.machine:
+            return self.receivejson(line)
+
+        if line == 'quit':
+            self.closed = True
+            return ""
+
+        if line == 'help':
+            return "Commands: \n%s\n\n" % "\n".join(self.cmds)
+
+        if line == 'machine':
+            self.machine = True
+            return json.dumps({ 'ok': True, 'result': 'machine' }) + "\n"
+
+        if not self.playername:
+            if not line.strip():
+                return self.greeting()
+            cmd, args = 'login', [ line ]
+        else:
+            args = line.split()
+            cmd = args and args.pop(0)
+            # humans may type anything
+            if cmd not in self.names:
+                return ""
+
+        try:
+            if cmd in self.views:
+                return self.textview(cmd, args)
+            return self.textreply(cmd, self.execute(cmd, args))
+        except tables.TableError, error:
+            return "%s\n" % error
+
+    def receivejson(self, line):
+        """receivejson(line) -> reply
+        Handle a request in machine mode."""
+        reply = { 'id': None, 'ok': True }
+
+        try:
+            request = json.loads(line)
+            reply['id'] = request.get('id')
+            cmd = tostr(request['cmd'])
+            args = request.get('args', [])
+            since = request.get('since')
+            if not isinstance(args, list):
+                raise TypeError, "args must be a list"
+            if since is not None and not isinstance(since, (int, long)):
+                raise TypeError, "since must be a version"
+        except (ValueError, KeyError, TypeError, AttributeError):
+            reply['ok'], reply['error'] = False, "invalid request"
+            return json.dumps(reply) + "\n"
+
+        try:
+            if cmd in self.views:
+                return self.jsonview(reply['id'], cmd, since)
+
+            if cmd == 'quit':
+                self.closed = True
+            reply['result'] = self.jsonresult(cmd, self.execute(cmd, args))
+        except tables.TableError, error:
+            reply['ok'], reply['error'] = False, str(error)
+
+        return json.dumps(reply) + "\n"
+
+    def viewtable(self, cmd, since):
+        """viewtable(cmd, since) -> table
+        Return the table to show the view 'cmd' of, None if it is still
+        at the version 'since'."""
+        if not self.playername:
+            raise tables.TableError, "not logged in"
+
+        if cmd == 'hand':
+            table = self.registry.gettable(self.playername)
+        else:
+            table = self.registry.watchedtable(self.playername)
+        if since == table.version:
+            return None
+        return table
+
+    def viewkey(self, cmd, mode):
+        # hands differ by player, the other views are the same for all
+        return (cmd, mode, cmd == 'hand' and self.playername or None)
+
+    def textview(self, cmd, args):
+        """textview(cmd, args) -> reply
+        Like textreply(), for the views rendered once per version of the
+        table. The optional argument is the version the client has."""
+        since = None
+        if args:
+            since = parsenumber(args, cmd)
+
+        table = self.viewtable(cmd, since)
+        if table is None:
+            return "unchanged\n"
+
+        return table.view(self.viewkey(cmd, 'text'),
+                          lambda: self.textreply(cmd, self.execute(cmd, [])))
+
+    def jsonview(self, requestid, cmd, since):
+        """jsonview(requestid, cmd, since) -> reply
+        Like jsonresult(), for the views rendered once per version of the
+        table, and only if it has changed since the version 'since'."""
+        table = self.viewtable(cmd, since)
+        if table is None:
+            return json.dumps({ 'id': requestid, 'ok': True,
+                                'version': since, 'unchanged': True }) + "\n"
+
+        result = table.view(self.viewkey(cmd, 'json'),
+            lambda: json.dumps(self.jsonresult(cmd, self.execute(cmd, []))))
+        return '{"id": %s, "ok": true, "version": %s, "result": %s}\n' % (
+            json.dumps(requestid), table.version, result)
+
+    def execute(self, cmd, args):
+        """execute(cmd, args) -> result
+        Run the command 'cmd' with the list of arguments 'args'. Return
+        the data for textreply() or jsonresult()."""
+        registry = self.registry
+
+        if cmd == 'login':
+            if self.playername:
+                raise tables.TableError, "already logged in"
+            if not args or not isinstance(args[0], basestring) or \
+                    not args[0].strip():
+                raise tables.TableError, "usage: login name"
+            name = tostr(args[0])
+            try:
+                # names are sent to machine mode clients as JSON
+                name.decode('utf-8')
+            except UnicodeDecodeError:
+                raise tables.TableError, "invalid name"
+            registry.login(name, self.notify)
+            self.playername = name
+            return self.playername
+
+        if cmd in ('help', 'quit'):
+            return self.cmds
+
+        if not self.playername:
+            raise tables.TableError, "not logged in"
+
+        name = self.playername
+
+        if cmd == 'tables':
+            return registry.tablelist()
+
+        if cmd == 'create':
+            return registry.create(name)
+
+        if cmd == 'join':
+            return registry.join(name, parsenumber(args, cmd))
+
+        if cmd == 'leave':
+            return registry.leave(name)
+
+        if cmd == 'watch':
+            return registry.spectate(name, parsenumber(args, cmd))
+
+        if cmd == 'start':
+            table = registry.gettable(name)
+            table.start()
+            return self.checkfinished(table)
+
+        if cmd == 'bot':
+            return registry.gettable(name).addbot()
+
+        if cmd == 'players':
+            return registry.watchedtable(name).players
+
+        if cmd == 'hand':
+            return registry.gettable(name).hand(name)
+
+        if cmd == 'play':
+            cardidx = parsenumber(args, cmd)
+            table = registry.gettable(name)
+            table.playcard(name, cardidx)
+            return cardidx, table, self.checkfinished(table)
+
+        if cmd == 'field':
+            return registry.watchedtable(name).field()
+
+        if cmd == 'handwinner':
+            return registry.watchedtable(name).handwinner
+
+        if cmd == 'version':
+            return registry.watchedtable(name).version
+
+        raise tables.TableError, "unknown command %s" % cmd
+
+    def checkfinished(self, table):
+        """checkfinished(table) -> results
+        Reclaim 'table' if its game is over, returning the results, None
+        otherwise."""
+        if not table.finished():
+            return None
+
+        self.registry.reclaim(table)
+        return table.results()
+
+    def textreply(self, cmd, result):
+        """textreply(cmd, result) -> string
+        Format the result of a command for humans."""
+        if cmd == 'login':
+            return "Hello %s\n" % result
+
+        if cmd == 'tables':
+            return "".join([ "%s (%s): %s\n" % (table.id, table.state(),
+                                                " ".join(table.players))
+                             for table in result ]) or "\n"
+
+        if cmd == 'create':
+            return "table %s created\n" % result.id
+
+        if cmd == 'join':
+            return "joined table %s\n" % result.id
+
+        if cmd == 'leave':
+            return "left table %s\n" % result.id
+
+        if cmd == 'watch':
+            return "watching table %s\n" % result.id
+
+        if cmd == 'start':
+            return self.textresults(result)
+
+        if cmd == 'bot':
+            return "%s joined\n" % result
+
+        if cmd == 'players':
+            return " ".join(result) + "\n"
+
+        if cmd == 'hand':
+            return " ".join([ "%s: %s" % (idx, showcard(card))
+                              for idx, card in enumerate(result) ]) + "\n"
+
+        if cmd == 'play':
+            cardidx, table, results = result
+            return "%s played\n" % cardidx + self.textresults(results)
+
+        if cmd == 'field':
+            if result is None:
+                return "\n"
+
+            briscola = result['briscola']
+            played = "".join([ "%s: %s" % (idxcard, showcard(card))
+                for idxcard, card in enumerate(result['played']) ])
+            return "turn: %s briscola: %s of %s %s\n" % (result['turn'],
+                briscola.value, briscola.seed, played)
+
+        if cmd == 'handwinner':
+            return result and "%s\n" % result or "\n"
+
+        if cmd == 'version':
+            return "%s\n" % result
+
+        return ""
+
+    def textresults(self, results):
+        if results is None:
+            return ""
+        return showresults(results)
+
+    def tabledata(self, table):
+        return { 'id': table.id, 'state': table.state(),
+                 'players': table.players }
+
+    def fielddata(self, field):
+        if field is None:
+            return None
+        return { 'turn': field['turn'],
+                 'briscola': carddata(field['briscola']),
+                 'played': [ carddata(card) for card in field['played'] ] }
+
+    def jsonresult(self, cmd, result):
+        """jsonresult(cmd, result) -> data
+        Convert the result of a command to JSON data."""
+        if cmd == 'tables':
+            return [ self.tabledata(table) for table in result ]
+
+        if cmd in ('create', 'join', 'leave', 'watch'):
+            return self.tabledata(result)
+
+        if cmd == 'start':
+            return { 'results': result }
+
+        if cmd == 'hand':
+            return [ carddata(card) for card in result ]
+
+        if cmd == 'play':
+            cardidx, table, results = result
+            return { 'played': cardidx,
+                     'hand': [ carddata(card)
+                               for card in table.hand(self.playername) ],
+                     'field': self.fielddata(table.field()),
+                     'handwinner': table.handwinner,
+                     'results': results,
+                     'version': table.version }
+
+        if cmd == 'field':
+            return self.fielddata(result)
+
+        return result
+
+    def disconnect(self):
+        """Log the player out, leaving his table."""
+        if self.playername:
+            self.registry.logout(self.playername)
+            self.playername = None
@@ -0,0 +1,496 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Pryscola, game tables hosted by the server. Each table seats its own
+players and plays its own game, and the registry keeps track of the tables
+and of who sits where.
+
+Tables publish what happens in their game as events, sent to the players
+seated and to the spectators as it happens, so that clients need not poll:
+'start' (players, briscola, turn), 'dealt' (cards, only for the player who
+gets them), 'played' (player, card, turn), 'trick' (winner, points, turn)
+and 'over' (results). 'turn' is the name of the player who has to play
+next, None at the end of the game."""
+
+__revision__ = "20261018"
+
+from itertools import count
+
+import briscola
+import montecarlo
+
+# players at a table, at most
+MAXPLAYERS = 4
+
+# limits of the Monte Carlo search of the bots for each move, see
+# montecarlo.MonteCarloPlayer: the server plays them in its event loop,
+# stalling every connection meanwhile
+BOTSAMPLES = 200
+BOTBUDGET = 5
+
+def isbotname(name):
+    """isbotname(name) -> boolean
+    Return True for the names given to bots, see Table.addbot(), which
+    players cannot log in with."""
+    return name.startswith("bot") and name[3:].isdigit()
+
+class TableError(Exception):
+    """Exception to be thrown when a table command is not allowed."""
+    def __init__(self, message):
+        Exception.__init__(self, message)
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+class Event:
+    """Something that happened at a table: its 'name', its 'data', and the
+    only player it is for, None if it is for all the subscribers. Each
+    serialization is done once, however many connections get the event."""
+
+    def __init__(self, name, data, recipient=None, version=0):
+        self.name = name
+        self.data = data
+        self.recipient = recipient
+        # version of the table after the event
+        self.version = version
+        self.serialized = {}
+
+    def serialize(self, formatter):
+        """serialize(formatter) -> string
+        Return formatter(self), calling it only the first time."""
+        try:
+            return self.serialized[formatter]
+        except KeyError:
+            self.serialized[formatter] = formatter(self)
+            return self.serialized[formatter]
+
+class TableGame(briscola.Game):
+    """A briscola.Game remembering the cards dealt to each player, by name,
+    until the table publishes them."""
+
+    def __init__(self, players, seed=None):
+        self.dealt = {}
+        briscola.Game.__init__(self, players, seed)
+
+    def dealtcard(self, player, card):
+        self.dealt.setdefault(player.name, []).append(card)
+        return card
+
+class Table:
+    """A table: the names of the players in the order they sat down,
+    those of them played by the computer in 'bots', and the game once
+    started. Seats are fixed, while briscola.Game rotates its players at
+    each trick: 'curplayer' is the index in the current trick of the
+    player who has to play, 'handwinner' the index of the winner of the
+    last trick in it, None while a trick is being played. 'version' is
+    taken from the iterator 'versions' at every change, see view(): the
+    tables of a registry share it, so that their versions never match.
+    Bots search each move for at most 'samples' deals and 'budget'
+    milliseconds. The deck is shuffled according to 'seed', see
+    briscola.Game."""
+
+    def __init__(self, tableid, samples=BOTSAMPLES, budget=BOTBUDGET,
+                 seed=None, versions=None):
+        self.id = tableid
+        self.samples = samples
+        self.budget = budget
+        self.seed = seed
+        self.players = []
+        self.bots = set()
+        # seat of each player, and his briscola.Player once playing, by name
+        self.seats = {}
+        self.gameplayers = {}
+        self.game = None
+        self.curplayer = 0
+        self.handwinner = None
+        # who gets the events, by name: players seated and spectators
+        self.subscribers = {}
+        self.spectators = set()
+        if versions is None:
+            versions = count()
+        self.versions = versions
+        self.version = next(versions)
+        # rendered views of the current version, by key
+        self.views = {}
+
+    def changed(self):
+        """Move to the next version, dropping the views of the old one."""
+        self.version = next(self.versions)
+        self.views = {}
+
+    def view(self, key, render):
+        """view(key, render) -> view
+        Return render(), calling it once per version of the table: 'key'
+        names the view, such as the hand of a player in some format."""
+        try:
+            return self.views[key]
+        except KeyError:
+            self.views[key] = render()
+            return self.views[key]
+
+    def subscribe(self, name, callback):
+        """Call callback(event) for each event of the table meant for
+        'name'."""
+        self.subscribers[name] = callback
+
+    def unsubscribe(self, name):
+        self.subscribers.pop(name, None)
+
+    def publish(self, name, data, recipient=None):
+        """Send the event 'name' to the subscribers, or to 'recipient'
+        only."""
+        event = Event(name, data, recipient, self.version)
+        for subscriber, callback in self.subscribers.items():
+            if recipient is None or recipient == subscriber:
+                callback(event)
+
+    def publishdealt(self):
+        """Send each player the cards dealt to him since the last time."""
+        dealt, self.game.dealt = self.game.dealt, {}
+        for name in self.players:
+            if name in dealt:
+                self.publish('dealt', { 'cards': dealt[name] }, name)
+
+    def sit(self, name, isbot=False):
+        """Give the next seat to 'name'."""
+        if self.game:
+            raise TableError, "table %s is playing" % self.id
+        if len(self.players) >= MAXPLAYERS:
+            raise TableError, "table %s is full" % self.id
+        if name in self.seats:
+            raise TableError, "%s is already at table %s" % (name, self.id)
+
+        self.seats[name] = len(self.players)
+        self.players.append(name)
+        if isbot:
+            self.bots.add(name)
+        self.changed()
+
+    def stand(self, name):
+        """Free the seat of 'name'. During a game, the computer plays for
+        him instead."""
+        if self.game:
+            self.bots.add(name)
+            self.gameplayers[name].ishuman = False
+            self.changed()
+            self.playbots()
+            return
+
+        self.players.remove(name)
+        self.bots.discard(name)
+        self.seats = dict((player, seat)
+                          for seat, player in enumerate(self.players))
+        self.changed()
+
+    def humans(self):
+        """humans() -> list
+        Return the names of the players not played by the computer."""
+        return [ name for name in self.players if name not in self.bots ]
+
+    def addbot(self):
+        """addbot() -> name
+        Seat a new non-human player, return his name."""
+        idx = len(self.bots) + 1
+        while "bot%s" % idx in self.seats:
+            idx += 1
+
+        name = "bot%s" % idx
+        self.sit(name, isbot=True)
+        return name
+
+    def start(self, seed=None):
+        """Start the game, shuffling the deck according to 'seed' or to
+        the seed of the table, which also seeds the bots, then let the
+        non-human players play until it is a human's turn."""
+        if self.game:
+            raise TableError, "table %s is already playing" % self.id
+        if len(self.players) < 2:
+            raise TableError, "at least 2 players are needed"
+
+        if seed is None:
+            seed = self.seed
+
+        players = []
+        for seat, name in enumerate(self.players):
+            team = seat % 2 and 'b' or 'a'
+            if name in self.bots:
+                # bots draw their deals from streams of the game seed too
+                botseed = None
+                if seed is not None:
+                    botseed = briscola.gameseed(seed, seat)
+                players.append(montecarlo.MonteCarloPlayer(name, team=team,
+                    number=seat, samples=self.samples, budget=self.budget,
+                    seed=botseed))
+            else:
+                players.append(briscola.Player(name, team=team,
+                                               number=seat))
+
+        self.game = TableGame(players, seed)
+        self.gameplayers = dict((player.name, player) for player in players)
+        self.curplayer = 0
+        self.handwinner = None
+        self.changed()
+
+        self.publish('start', { 'players': self.players,
+                                'briscola': self.game.deck.briscola,
+                                'turn': self.game.players[0].name })
+        self.publishdealt()
+        self.playbots()
+
+    def finished(self):
+        """finished() -> boolean
+        Return True if the game has been played until the end."""
+        return self.game is not None and self.game.finished()
+
+    def turn(self, name):
+        """turn(name) -> idx
+        Return the index of 'name' in the current trick."""
+        return (self.seats[name] - self.game.players[0].number) % \
+            len(self.players)
+
+    def playcard(self, name, cardidx):
+        """Play the card 'cardidx' of the hand of 'name', then let the
+        non-human players play until it is a human's turn."""
+        if not self.game or self.finished():
+            raise TableError, "no game is being played"
+
+        playeridx = self.turn(name)
+        if playeridx != self.curplayer:
+            raise TableError, "Not your turn!"
+        if not 0 <= cardidx < len(self.game.players[playeridx].hand):
+            raise TableError, "no such card: %s" % cardidx
+
+        self.__playcard(playeridx, cardidx)
+        self.playbots()
+
+    def __playcard(self, playeridx, cardidx):
+        player = self.game.players[playeridx]
+        card = player.hand[cardidx]
+        self.game.playcard(playeridx, cardidx)
+        self.changed()
+
+        if len(self.game.cardsplayed) != len(self.players):
+            self.handwinner = None
+            self.curplayer = playeridx + 1
+            self.publish('played', { 'player': player.name, 'card': card,
+                'turn': self.game.players[self.curplayer].name })
+            return
+
+        # no players left
+        self.publish('played', { 'player': player.name, 'card': card,
+                                 'turn': None })
+        points = sum([ played.points for played in self.game.cardsplayed ])
+        self.handwinner = self.game.resolvetrick()
+        self.curplayer = 0
+        self.changed()
+
+        finished = self.game.finished()
+        self.publish('trick', { 'winner': self.game.players[0].name,
+            'points': points,
+            'turn': not finished and self.game.players[0].name or None })
+        self.publishdealt()
+
+        if finished:
+            self.game.computeresults()
+            self.changed()
+            self.publish('over', { 'results': self.results() })
+
+    def playbots(self):
+        """Let non-human players play until it is a human's turn."""
+        while self.game and self.game.players[self.curplayer].hand:
+            player = self.game.players[self.curplayer]
+            if player.name not in self.bots:
+                return
+
+            cardidx = player.getchoice(self.game.cardsplayed,
+                                       self.game.deck.briscola)
+            self.__playcard(self.curplayer, cardidx)
+
+    def state(self):
+        """state() -> string
+        Return 'waiting', 'playing' or 'finished'."""
+        if self.finished():
+            return "finished"
+        elif self.game:
+            return "playing"
+        return "waiting"
+
+    def hand(self, name):
+        """hand(name) -> list
+        Return the cards of 'name', none before the game."""
+        if not self.game:
+            return []
+        return self.gameplayers[name].hand
+
+    def field(self):
+        """field() -> dict
+        Return whose turn it is, the briscola and the cards played in the
+        current trick, or None before the game."""
+        if not self.game:
+            return None
+
+        return { 'turn': self.game.players[self.curplayer].name,
+                 'briscola': self.game.deck.briscola,
+                 'played': self.game.cardsplayed }
+
+    def results(self):
+        """results() -> list
+        Return the name and the points of each player, by seat."""
+        return [ (name, self.gameplayers[name].points)
+                 for name in self.players ]
+
+class TableRegistry:
+    """The tables of the server by id, and the table of each connected
+    player by name. Tables are dropped when the last human leaves, or at
+    the end of their game, sending their players back to the lobby.
+    Players seated or watching a table get its events, see Table.publish(),
+    through the listener they logged in with. See Table for 'samples' and
+    'budget'. Given a 'seed', the games of the tables are the series it
+    identifies, see briscola.gameseed()."""
+
+    def __init__(self, samples=BOTSAMPLES, budget=BOTBUDGET, seed=None):
+        self.samples = samples
+        self.budget = budget
+        self.seed = seed
+        self.tables = {}
+        # players connected, and the table of those seated or watching
+        self.names = set()
+        self.playertables = {}
+        self.spectating = {}
+        # callback(event) of each player, see Table.subscribe()
+        self.listeners = {}
+        self.nextid = 1
+        # versions of all the tables, see Table
+        self.versions = count()
+
+    def login(self, name, listener=None):
+        """Connect the player 'name', who must be unique. listener(event)
+        is then called for the events of his table."""
+        if name in self.names:
+            raise TableError, "name %s is taken" % name
+        if isbotname(name):
+            raise TableError, "name %s is reserved" % name
+        self.names.add(name)
+        if listener is not None:
+            self.listeners[name] = listener
+
+    def logout(self, name):
+        """Disconnect the player 'name', leaving his table."""
+        if name in self.playertables or name in self.spectating:
+            self.leave(name)
+        self.names.discard(name)
+        self.listeners.pop(name, None)
+
+    def create(self, name):
+        """create(name) -> Table
+        Create a new table and seat 'name' at it."""
+        self.checkfree(name)
+        seed = None
+        if self.seed is not None:
+            seed = briscola.gameseed(self.seed, self.nextid)
+        table = Table(self.nextid, self.samples, self.budget, seed,
+                      self.versions)
+        self.nextid += 1
+        self.tables[table.id] = table
+        self.join(name, table.id)
+        return table
+
+    def checkfree(self, name):
+        """Raise TableError if 'name' already sits at or watches a
+        table."""
+        table = self.playertables.get(name) or self.spectating.get(name)
+        if table is not None:
+            raise TableError, "already at table %s" % table.id
+
+    def findtable(self, name, tableid):
+        """findtable(name, tableid) -> Table
+        Return the table 'tableid' for 'name' to join or watch."""
+        self.checkfree(name)
+        try:
+            return self.tables[tableid]
+        except KeyError:
+            raise TableError, "no table %s" % tableid
+
+    def join(self, name, tableid):
+        """join(name, tableid) -> Table"""
+        table = self.findtable(name, tableid)
+        table.sit(name)
+        self.playertables[name] = table
+        if name in self.listeners:
+            table.subscribe(name, self.listeners[name])
+        return table
+
+    def spectate(self, name, tableid):
+        """spectate(name, tableid) -> Table
+        Let 'name' get the events of a table without a seat at it."""
+        table = self.findtable(name, tableid)
+        table.spectators.add(name)
+        self.spectating[name] = table
+        if name in self.listeners:
+            table.subscribe(name, self.listeners[name])
+        return table
+
+    def leave(self, name):
+        """leave(name) -> Table
+        Take 'name' away from the table he sits at or watches."""
+        if name in self.spectating:
+            table = self.spectating.pop(name)
+            table.spectators.discard(name)
+            table.unsubscribe(name)
+            return table
+
+        table = self.gettable(name)
+        del self.playertables[name]
+        table.unsubscribe(name)
+        table.stand(name)
+
+        if not table.humans() or table.finished():
+            self.reclaim(table)
+        return table
+
+    def gettable(self, name):
+        """gettable(name) -> Table
+        Return the table of the player 'name'."""
+        try:
+            return self.playertables[name]
+        except KeyError:
+            raise TableError, "not at a table"
+
+    def watchedtable(self, name):
+        """watchedtable(name) -> Table
+        Return the table 'name' sits at or watches, for read only views."""
+        try:
+            return self.spectating[name]
+        except KeyError:
+            return self.gettable(name)
+
+    def reclaim(self, table):
+        """Drop 'table', sending its players back to the lobby."""
+        self.tables.pop(table.id, None)
+        for name in table.players:
+            if self.playertables.get(name) is table:
+                del self.playertables[name]
+        for name in table.spectators:
+            if self.spectating.get(name) is table:
+                del self.spectating[name]
+
+    def tablelist(self):
+        """tablelist() -> list
+        Return the tables, by id."""
+        return [ self.tables[tableid] for tableid in sorted(self.tables) ]
@@ -0,0 +1,114 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'aioserver', Pryscola's game server on asyncore."""
+
+import asyncore
+import json
+import os
+import socket
+import sys
+import threading
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+import aioserver
+
+class AioServerCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.server = aioserver.BriscolaServer(0)
+        self.port = self.server.socket.getsockname()[1]
+        self.running = True
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.start()
+
+    def serve(self):
+        while self.running:
+            asyncore.loop(timeout=0.05, map=self.server.channels, count=1)
+
+    def tearDown(self):
+        # stop polling before closing the sockets
+        self.running = False
+        self.thread.join()
+        for channel in self.server.channels.values():
+            channel.close()
+
+    def connect(self):
+        sock = socket.create_connection(('localhost', self.port))
+        return sock, sock.makefile()
+
+    def testSession(self):
+        """clients should be greeted, play and log out on quit"""
+        sock, lines = self.connect()
+        sock.sendall("ema\r\ncreate\r\nbot\r\nplayers\r\n")
+        self.assertEqual(lines.readline(), "username -> Hello ema\n")
+        self.assertEqual(lines.readline(), "table 1 created\n")
+        self.assertEqual(lines.readline(), "bot1 joined\n")
+        self.assertEqual(lines.readline(), "ema bot1\n")
+
+        other, otherlines = self.connect()
+        other.sendall("ema\r\n")
+        self.assertEqual(otherlines.readline(),
+                         "username -> name ema is taken\n")
+
+        sock.sendall("quit\r\n")
+        self.assertEqual(lines.readline(), "")
+        self.assertEqual(self.server.registry.names, set())
+        sock.close()
+        other.close()
+
+    def testLongLine(self):
+        """lines longer than the limit should close the connection"""
+        sock, lines = self.connect()
+        sock.sendall("ema\r\n")
+        self.assertEqual(lines.readline(), "username -> Hello ema\n")
+
+        sock.sendall("x" * (aioserver.BriscolaChannel.maxlength + 1))
+        self.assertEqual(lines.readline(), "")
+        self.assertEqual(self.server.registry.names, set())
+        sock.close()
+
+    def testMachine(self):
+        """pipelined machine mode requests should all be answered, in
+        order"""
+        sock, lines = self.connect()
+        requests = [ { 'id': idx, 'cmd': cmd, 'args': args }
+                     for idx, (cmd, args) in enumerate([ ('login', [ 'ema' ]),
+                     ('create', []), ('bot', []), ('start', []),
+                     ('hand', []) ]) ]
+        sock.sendall("machine\r\n" + "".join([ json.dumps(request) + "\r\n"
+                                               for request in requests ]))
+
+        self.assertEqual(lines.read(len("username -> ")), "username -> ")
+        self.failUnless(json.loads(lines.readline())['ok'])
+        replies = []
+        while len(replies) < len(requests):
+            reply = json.loads(lines.readline())
+            # the events of the game, pushed before the replies
+            if 'event' not in reply:
+                replies.append(reply)
+        self.assertEqual([ reply['id'] for reply in replies ], range(5))
+        self.failUnless(all(reply['ok'] for reply in replies))
+        self.assertEqual(len(replies[-1]['result']), 3)
+        sock.close()
+
+if __name__ == '__main__':
+    unittest.main()
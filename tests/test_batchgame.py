@@ -0,0 +1,50 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'batchgame', Pryscola's vectorized engine."""
+
+import os
+import sys
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+try:
+    import batchgame
+except ImportError:
+    # NumPy is not available
+    batchgame = None
+
+@unittest.skipIf(batchgame is None, "NumPy not available")
+class BatchGameCheck(unittest.TestCase):
+
+    def testMatchesObjectEngine(self):
+        """BatchGame should end with the same points as the object engine
+        for the same seeds"""
+        seeds = range(200)
+        for nplayers in (2, 3, 4):
+            game = batchgame.BatchGame(nplayers,
+                                       batchgame.shuffleddecks(seeds))
+            game.play()
+
+            self.assertEqual(game.points.tolist(),
+                             batchgame.playobjectgames(nplayers, seeds))
+
+if __name__ == "__main__":
+    unittest.main()
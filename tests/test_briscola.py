@@ -21,6 +21,7 @@
 """Unit testing of 'briscola', Pryscola's main module."""
 
 import os
+import random
 import sys
 import unittest
 
@@ -29,6 +30,22 @@ sys.path.append(MAINDIR)
 
 import briscola
 
+def recursivehandwinner(cardlist, curbriscola, first, second):
+    """The original, recursive, handwinner() implementation, used as a
+    reference."""
+    if len(cardlist) == 1:
+        return first
+
+    if cardlist[first].beats(cardlist[second], curbriscola):
+        if second+1 == len(cardlist):
+            return first
+        return recursivehandwinner(cardlist, curbriscola, first, second+1)
+
+    if second+1 == len(cardlist):
+        return second
+
+    return recursivehandwinner(cardlist, curbriscola, second, second+1)
+
 class CardCheck(unittest.TestCase):
 
     def setUp(self):
@@ -62,12 +79,23 @@ class CardCheck(unittest.TestCase):
 
         card1 = briscola.Card('QUADRI', 'ASSO')
         card2 = briscola.Card('FIORI', 'ASSO')
-        self.assertEqual(card1, card2)
+        self.failIf(card1 < card2 or card1 > card2)
+        self.failUnless(card1 <= card2 and card1 >= card2)
 
         card1 = briscola.Card('PICCHE', 'DONNA')
         card2 = briscola.Card('CUORI', 'JACK')
         self.failUnless(card1 > card2)
     
+    def testInternedCards(self):
+        """Card() should always return the same immutable instance"""
+        card = briscola.Card('CUORI', 'ASSO')
+        self.failUnless(card is briscola.Card('CUORI', 'ASSO'))
+        self.failUnless(card is briscola.idcard(card.id))
+        self.failIf(card == briscola.Card('QUADRI', 'ASSO'))
+        self.assertEqual(len(set(self.cards + briscola.Deck().cards)), 
+                         briscola.NCARDS)
+        self.assertRaises(AttributeError, setattr, card, 'points', 0)
+
     def testCardIsBriscola(self):
         """isbriscola() should return True if briscola.seed equals card.seed"""
         card = briscola.Card('CUORI', 'ASSO')
@@ -99,11 +127,262 @@ class CardCheck(unittest.TestCase):
         card2 = briscola.Card('PICCHE', 'ASSO')
         self.failUnless(card1.beats(card2, self.curbriscola))
 
+    def testCardIds(self):
+        """card ids should be seed * NRANKS + rank, and unique"""
+        ids = [ card.id for card in self.cards ]
+        self.assertEqual(sorted(ids), range(briscola.NCARDS))
+
+        for card in self.cards:
+            self.assertEqual(briscola.SEEDS[briscola.IDSEED[card.id]], 
+                             card.seed)
+            self.assertEqual(briscola.CARDSNAMES[briscola.IDRANK[card.id]], 
+                             card.value)
+            self.assertEqual(briscola.IDPOINTS[card.id], 
+                             briscola.CARDSPOINTS.get(card.value, 0))
+
+    def testBeatsTable(self):
+        """the BEATS table should agree with Briscola's rules"""
+        for briscolacard in self.cards:
+            for card1 in self.cards:
+                for card2 in self.cards:
+                    if card1.seed == card2.seed:
+                        expected = briscola.CARDSNAMES.index(card1.value) > \
+                            briscola.CARDSNAMES.index(card2.value)
+                    else:
+                        expected = card2.seed != briscolacard.seed
+
+                    self.assertEqual(card1.beats(card2, briscolacard), 
+                                     expected)
+
+class HandWinnerCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.cards = briscola.Deck().getcardlist()
+        # one briscola for each seed
+        self.briscolas = self.cards[::briscola.NRANKS]
+
+    def testAllTwoCardsTricks(self):
+        """handwinner() and trickwinner() should agree with the recursive
+        implementation on every two cards trick"""
+        for curbriscola in self.briscolas:
+            for card1 in self.cards:
+                for card2 in self.cards:
+                    if card1 is card2:
+                        continue
+                    trick = [ card1, card2 ]
+                    expected = recursivehandwinner(trick, curbriscola, 0, 1)
+
+                    self.assertEqual(
+                        briscola.handwinner(trick, curbriscola, 0, 1), 
+                        expected)
+                    self.assertEqual(
+                        briscola.trickwinner([ card1.id, card2.id ],
+                                             curbriscola.seedidx), 
+                        expected)
+
+    def testLongerTricks(self):
+        """handwinner() and trickwinner() should agree with the recursive
+        implementation on tricks of 1 to 6 cards"""
+        rand = random.Random(1042)
+        for ncards in range(1, 7):
+            for count in range(2000):
+                trick = rand.sample(self.cards, ncards)
+                curbriscola = rand.choice(self.briscolas)
+                expected = recursivehandwinner(trick, curbriscola, 0, 1)
+
+                self.assertEqual(
+                    briscola.handwinner(trick, curbriscola, 0, 1), expected)
+                self.assertEqual(
+                    briscola.trickwinner([ card.id for card in trick ],
+                                         curbriscola.seedidx), 
+                    expected)
+
 class DeckCheck(unittest.TestCase):
-    pass
+
+    def cardids(self, deck):
+        return [ card.id for card in deck.cards ]
+
+    def testSeededDeck(self):
+        """decks built with the same seed should hold the same cards in the
+        same order"""
+        self.assertEqual(self.cardids(briscola.Deck(42)),
+                         self.cardids(briscola.Deck(42)))
+        self.assertNotEqual(self.cardids(briscola.Deck(42)),
+                            self.cardids(briscola.Deck(43)))
+
+    def testRandomStream(self):
+        """a deck should accept a random.Random instance"""
+        rand1, rand2 = random.Random(42), random.Random(42)
+        self.assertEqual(self.cardids(briscola.Deck(rand1)),
+                         self.cardids(briscola.Deck(rand2)))
+        self.assertEqual(rand1.random(), rand2.random())
+
+    def testShuffledDeals(self):
+        """shuffleddeals() should be reproducible and yield permutations"""
+        deals = list(briscola.shuffleddeals(10, 42))
+        self.assertEqual(deals, list(briscola.shuffleddeals(10, 42)))
+        for deal in deals:
+            self.assertEqual(sorted(deal), range(briscola.NCARDS))
+
+    def testGameSeeds(self):
+        """games of a series should have their own seeds"""
+        seeds = [ briscola.gameseed(seed, idx)
+                  for seed in range(10) for idx in range(10) ]
+        self.assertEqual(len(set(seeds)), len(seeds))
 
 class GameCheck(unittest.TestCase):
-    pass
+
+    def newgame(self, nplayers, seed=42):
+        players = [ briscola.Player(name, ishuman=False, number=idx,
+                                    team=idx % 2 and 'b' or 'a') 
+                    for idx, name in enumerate(briscola.Game.nonhumans) ]
+        return briscola.Game(players[:nplayers], seed)
+
+    def testResolveTrick(self):
+        """resolvetrick() should score the trick, let the winner lead and
+        deal new cards"""
+        game = self.newgame(3)
+        ndeck = len(game.deck.cards)
+
+        for idxplayer in range(3):
+            game.playcard(idxplayer, 0)
+        trick = game.cardsplayed
+        expected = briscola.handwinner(trick, game.deck.briscola, 0, 1)
+        winner = game.players[expected]
+
+        self.assertEqual(game.resolvetrick(), expected)
+        self.failUnless(game.players[0] is winner)
+        self.assertEqual(winner.points, sum([ card.points for card in trick ]))
+        self.assertEqual(game.cardsplayed, [])
+        self.assertEqual(len(game.deck.cards), ndeck - 3)
+        for player in game.players:
+            self.assertEqual(len(player.hand), 3)
+
+    def testWholeGames(self):
+        """step() should play games until every card has been played"""
+        for nplayers in (2, 3, 4):
+            game = self.newgame(nplayers)
+            while not game.finished():
+                game.step()
+
+            self.assertEqual(sum([ player.points 
+                                   for player in game.players ]), 120)
+            game.computeresults()
+
+    def checktracker(self, game):
+        tracker = game.tracker
+        inplay = list(game.deck.cards)
+        for player in game.players:
+            inplay.extend(player.hand)
+
+        self.assertEqual(tracker.unplayed,
+                         sum([ 1 << card.id for card in inplay ]))
+        self.assertEqual(tracker.ndeck, len(game.deck.cards))
+        self.assertEqual(tracker.trumps, len([ card for card in inplay
+            if card.isbriscola(game.deck.briscola) ]))
+        for seedidx in range(briscola.NSEEDS):
+            self.assertEqual(tracker.seedpoints[seedidx],
+                             sum([ card.points for card in inplay
+                                   if card.seedidx == seedidx ]))
+
+        for player in game.players:
+            unseen = [ card for card in inplay
+                       if card not in player.hand and
+                          card is not game.deck.briscola ]
+            self.assertEqual(tracker.unseen(player),
+                             sum([ 1 << card.id for card in unseen ]))
+
+    def testTracker(self):
+        """the card tracker should follow every card played and drawn"""
+        for nplayers in (2, 3, 4):
+            game = self.newgame(nplayers, seed=nplayers)
+            self.checktracker(game)
+            self.assertEqual(game.tracker.pointsleft(), 120 -
+                (game.deck.removedcard and game.deck.removedcard.points or 0))
+
+            while not game.finished():
+                game.resetplayed()
+                for idx, player in enumerate(game.players):
+                    game.playcard(idx, player.getchoice(game.cardsplayed,
+                                                        game.deck.briscola))
+                    self.checktracker(game)
+                game.resolvetrick()
+                self.checktracker(game)
+
+            self.assertEqual(game.tracker.unplayed, 0)
+            self.assertEqual(game.tracker.pointsleft(), 0)
+
+    def testTrackerWithoutBriscola(self):
+        """the card tracker should work with five players, whose deck has no
+        briscola"""
+        players = [ briscola.Player('p%d' % idx, ishuman=False, number=idx)
+                    for idx in range(5) ]
+        game = briscola.Game(players, seed=5)
+        self.failUnless(game.deck.briscola is None)
+        self.assertEqual(game.tracker.trumps, 0)
+        self.assertEqual(game.tracker.pointsleft(), 120)
+
+        trick = []
+        for idxplayer in range(5):
+            trick.append(game.players[idxplayer].hand[0])
+            game.playcard(idxplayer, 0)
+        self.assertEqual(game.cardsplayed, trick)
+
+        tracker = game.tracker
+        self.assertEqual(tracker.trumps, 0)
+        self.assertEqual(tracker.pointsleft(),
+                         120 - sum([ card.points for card in trick ]))
+        for player in game.players:
+            unseen = [ card for other in game.players if other is not player
+                       for card in other.hand ]
+            self.assertEqual(tracker.unseen(player),
+                             sum([ 1 << card.id for card in unseen ]))
+
+    def testStats(self):
+        """instrumented games should account every phase, and stop doing so
+        for later games"""
+        stats = briscola.GameStats()
+        players = self.newgame(2).players
+        game = briscola.Game(players, 42, stats)
+        while not game.finished():
+            game.step()
+        game.computeresults()
+
+        self.assertEqual(stats.calls['givecards'], 1)
+        self.assertEqual(stats.calls['playcard'], 40)
+        self.assertEqual(stats.calls['resolvetrick'], 20)
+        self.assertEqual(stats.calls['getchoice'], 40)
+        self.assertEqual(stats.calls['computeresults'], 1)
+        self.failUnless(0 < stats.calls['aiplaycard'] < 40)
+
+        total = briscola.GameStats()
+        total.merge(stats)
+        total.merge(stats)
+        self.assertEqual(total.calls['playcard'], 80)
+
+        game = briscola.Game(players, 42)
+        while not game.finished():
+            game.step()
+        self.assertEqual(stats.calls['getchoice'], 40)
+        self.failIf('getchoice' in players[0].__dict__)
+
+    def testStatsKeepOverrides(self):
+        """new games should drop the timers only, not the methods set on
+        the players"""
+        players = self.newgame(2).players
+        chosen = []
+        def getchoice(cardsplayed=None, curbriscola=None):
+            chosen.append(len(cardsplayed))
+            return 0
+        players[0].getchoice = getchoice
+
+        game = briscola.Game(players, 42, briscola.GameStats())
+        self.failUnless(players[0].getchoice.wrapped is getchoice)
+        game = briscola.Game(players, 42)
+        self.failUnless(players[0].getchoice is getchoice)
+        while not game.finished():
+            game.step()
+        self.assertEqual(len(chosen), 20)
 
 class PlayerCheck(unittest.TestCase):
     pass
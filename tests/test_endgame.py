@@ -0,0 +1,109 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'endgame', Pryscola's endgame solver."""
+
+import os
+import random
+import sys
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+import briscola
+import endgame
+
+def bruteforce(trump, tomove, other, lead=None):
+    """Plain minimax over lists of card ids, used as a reference. Return the
+    points scored by 'tomove' from here on."""
+    if not tomove:
+        return 0
+
+    total = sum([ briscola.IDPOINTS[cid] for cid in tomove + other ])
+    best = -1
+
+    for cid in tomove:
+        rest = [ card for card in tomove if card != cid ]
+
+        if lead is None:
+            points = total - bruteforce(trump, other, rest, cid)
+        elif briscola.idbeats(lead, cid, trump):
+            points = total - briscola.IDPOINTS[cid] - \
+                bruteforce(trump, other, rest)
+        else:
+            points = briscola.IDPOINTS[lead] + briscola.IDPOINTS[cid] + \
+                bruteforce(trump, rest, other)
+
+        best = max(best, points)
+
+    return best
+
+class EndgameSolverCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.solver = endgame.EndgameSolver()
+        self.cards = briscola.Deck().getcardlist()
+        self.cards.sort(key=lambda card: card.id)
+        self.rand = random.Random(1042)
+
+    def testMatchesBruteForce(self):
+        """search() should find the minimax value of random endgames"""
+        for count in range(300):
+            ncards = self.rand.randint(1, 3)
+            cards = self.rand.sample(range(briscola.NCARDS), 2 * ncards)
+            tomove, other = cards[:ncards], cards[ncards:]
+            trump = self.rand.randrange(briscola.NSEEDS)
+
+            points, cid = self.solver.search(trump, 
+                endgame.handmask([ self.cards[c] for c in tomove ]),
+                endgame.handmask([ self.cards[c] for c in other ]))
+
+            self.assertEqual(points, bruteforce(trump, tomove, other))
+            self.failUnless(cid in tomove)
+
+    def testFollowerMatchesBruteForce(self):
+        """search() should handle positions where a card has been led"""
+        for count in range(300):
+            ncards = self.rand.randint(1, 3)
+            cards = self.rand.sample(range(briscola.NCARDS), 2 * ncards)
+            lead, tomove, other = cards[0], cards[1:ncards+1], cards[ncards+1:]
+            trump = self.rand.randrange(briscola.NSEEDS)
+
+            tomovemask = sum([ 1 << cid for cid in tomove ])
+            othermask = sum([ 1 << cid for cid in other ])
+
+            self.assertEqual(
+                self.solver.search(trump, tomovemask, othermask, lead)[0],
+                bruteforce(trump, tomove, other, lead))
+
+class EndgamePlayerCheck(unittest.TestCase):
+
+    def testWholeGame(self):
+        """two EndgamePlayers should be able to play a whole game"""
+        players = [ endgame.EndgamePlayer(name, ishuman=False, number=idx)
+                    for idx, name in enumerate(('Kano', 'Sonya')) ]
+        game = briscola.Game(players)
+
+        while not game.finished():
+            game.step()
+
+        self.assertEqual(sum([ player.points for player in players ]), 120)
+
+if __name__ == "__main__":
+    unittest.main()
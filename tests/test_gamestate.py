@@ -0,0 +1,168 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'gamestate', Pryscola's compact game positions."""
+
+import os
+import random
+import sys
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+import briscola
+import gamestate
+
+def newgame(nplayers, seed=1042):
+    players = [ briscola.Player(name, ishuman=False, number=idx,
+                                team=idx % 2 and 'b' or 'a')
+                for idx, name in enumerate(briscola.Game.nonhumans[:nplayers]) ]
+    # the same deal at each run
+    return briscola.Game(players, seed)
+
+def relative(state):
+    """Hands of 'state' starting from the leader, as fromgame() numbers
+    seats."""
+    return state.hands[state.leader:] + state.hands[:state.leader]
+
+class GameStateCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.rand = random.Random(1042)
+
+    def testMirrorsGame(self):
+        """a GameState should follow the moves of a live Game"""
+        for nplayers in (2, 3, 4):
+            game = newgame(nplayers)
+            state = gamestate.GameState.fromgame(game)
+
+            while not game.finished():
+                for idxplayer, player in enumerate(game.players):
+                    idxcard = player.getchoice(game.cardsplayed,
+                                               game.deck.briscola)
+                    state.apply(player.hand[idxcard].id)
+                    game.playcard(idxplayer, idxcard)
+                game.resolvetrick()
+
+                current = gamestate.GameState.fromgame(game)
+                self.assertEqual(relative(state), current.hands)
+                self.assertEqual(state.ndeck, current.ndeck)
+
+            self.failUnless(state.finished())
+            self.assertEqual(sorted(state.points),
+                sorted([ player.points for player in game.players ]))
+
+    def testApplyUndo(self):
+        """undo() should restore the position and its hash"""
+        state = gamestate.GameState.fromgame(newgame(2))
+        initial = state.clone()
+        hashes = []
+
+        while not state.finished():
+            hashes.append(state.hash)
+            state.apply(self.rand.choice(state.moves()))
+            self.assertEqual(state.hash, state.computehash())
+
+        while hashes:
+            state.undo()
+            self.assertEqual(state.hash, hashes.pop())
+
+        self.assertEqual(state.hands, initial.hands)
+        self.assertEqual(state.ndeck, initial.ndeck)
+        self.assertEqual(state.points, initial.points)
+
+    def testClone(self):
+        """clones should not share mutable state"""
+        state = gamestate.GameState.fromgame(newgame(3))
+        clone = state.clone()
+        clone.apply(clone.moves()[0])
+
+        self.assertNotEqual(clone.hash, state.hash)
+        self.assertEqual(state.hash, state.computehash())
+        self.assertEqual(state.trick, [])
+
+    def testToGame(self):
+        """togame() should convert back to an equivalent live Game"""
+        game = newgame(4)
+        state = gamestate.GameState.fromgame(game)
+        for count in range(10):
+            state.apply(state.moves()[-1])
+
+        state.togame(game)
+        current = gamestate.GameState.fromgame(game)
+        self.assertEqual(relative(state), current.hands)
+        self.assertEqual(state.trick, current.trick)
+        self.assertEqual(state.ndeck, current.ndeck)
+
+        # the tracker should follow the new position
+        tracker = game.tracker
+        inplay = len(game.deck.cards) + sum([ len(player.hand)
+                                              for player in game.players ])
+        self.assertEqual(bin(tracker.unplayed).count('1'), inplay)
+        self.assertEqual(tracker.ndeck, len(game.deck.cards))
+        for card in game.cardsplayed:
+            self.failIf(tracker.unplayed >> card.id & 1)
+        self.assertEqual(tracker.pointsleft(), 120 - sum([ player.points
+            for player in game.players ]) - sum([ card.points
+            for card in game.cardsplayed ]))
+
+    def checkseats(self, state, game, seats):
+        nplayers = len(seats)
+        for pos, player in enumerate(game.players):
+            seat = (state.leader + pos) % nplayers
+            self.failUnless(player is seats[seat])
+            self.assertEqual(sum([ 1 << card.id for card in player.hand ]),
+                             state.hands[seat])
+            self.assertEqual(player.points, state.points[seat])
+
+    def testToGameTwice(self):
+        """togame() should give hands to the same players when called again"""
+        game = newgame(3)
+        seats = list(game.players)
+        state = gamestate.GameState.fromgame(game)
+        # play until another seat leads, stopping in the middle of a trick
+        while state.leader == 0:
+            for count in range(3):
+                state.apply(state.moves()[0])
+        state.apply(state.moves()[0])
+
+        state.togame(game)
+        self.checkseats(state, game, seats)
+        state.togame(game)
+        self.checkseats(state, game, seats)
+
+    def testToGameAfterTrick(self):
+        """togame() should restore the seats after the live game moved on"""
+        game = newgame(3)
+        seats = list(game.players)
+        state = gamestate.GameState.fromgame(game)
+
+        # play until the live game has rotated its players
+        while game.players[0] is seats[0]:
+            for idxplayer in range(3):
+                game.playcard(idxplayer, 0)
+            game.resolvetrick()
+
+        state.togame(game)
+        self.checkseats(state, game, seats)
+        self.assertEqual([ player.points for player in game.players ],
+                         [ 0, 0, 0 ])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'guicache', Pryscola's caches of pygame surfaces and
+fonts."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+# no window needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+try:
+    import pygame
+    import guicache
+except ImportError:
+    # pygame is not available
+    guicache = None
+
+@unittest.skipIf(guicache is None, "pygame not available")
+class ImageCacheCheck(unittest.TestCase):
+
+    def setUp(self):
+        pygame.display.init()
+        pygame.display.set_mode((100, 100))
+
+    def testShared(self):
+        """images should be loaded once, and rotated for horizontal cards"""
+        cache = guicache.ImageCache()
+        vertical = cache.get('asso_cuori')
+        horizontal = cache.get('asso_cuori', 'horizontal')
+
+        self.failUnless(cache.get('asso_cuori') is vertical)
+        self.failUnless(cache.get('asso_cuori', 'horizontal', 'default')
+                        is horizontal)
+        self.assertEqual(horizontal.get_size(), vertical.get_size()[::-1])
+
+    def testLeastRecentlyUsed(self):
+        """the least recently used image should be dropped when full"""
+        cache = guicache.ImageCache(maxentries=2)
+        first = cache.get('asso_cuori')
+        cache.get('tre_cuori')
+        cache.get('asso_cuori')
+        cache.get('re_cuori')
+
+        self.assertEqual(len(cache.images), 2)
+        self.failUnless(cache.get('asso_cuori') is first)
+        self.failIf(('default', 'tre_cuori', 'vertical') in cache.images)
+
+    def testThemes(self):
+        """preload() should load every image, settheme() only accept the
+        existing themes"""
+        cache = guicache.ImageCache()
+        cache.preload()
+        self.assertEqual(len(cache.images), 2 * 41)
+
+        self.failUnless('default' in guicache.themes())
+        self.assertRaises(ValueError, cache.settheme, 'nosuchtheme')
+
+@unittest.skipIf(guicache is None, "pygame not available")
+class AtlasCheck(unittest.TestCase):
+
+    def setUp(self):
+        pygame.display.init()
+        pygame.display.set_mode((100, 100), 0, 32)
+        self.cardsdir = guicache.CARDSDIR
+        guicache.CARDSDIR = tempfile.mkdtemp()
+        shutil.copytree(os.path.join(self.cardsdir, 'default'),
+                        os.path.join(guicache.CARDSDIR, 'default'))
+
+    def tearDown(self):
+        shutil.rmtree(guicache.CARDSDIR)
+        guicache.CARDSDIR = self.cardsdir
+
+    def testSameImages(self):
+        """images taken from the atlas should look like the original
+        ones"""
+        files = guicache.ImageCache()
+        files.preload()
+        guicache.buildatlas('default')
+        self.failUnless(guicache.Atlas.exists('default'))
+
+        for usemmap in (False, True):
+            cache = guicache.ImageCache(usemmap=usemmap)
+            cache.preload()
+            self.failUnless(cache.atlases['default'] is not None)
+
+            for key, image in cache.images.items():
+                original = files.images[key]
+                self.assertEqual(image.get_size(), original.get_size())
+
+                drawn = []
+                for surface in (image, original):
+                    field = pygame.Surface(surface.get_size())
+                    field.fill((0, 84, 0))
+                    field.blit(surface, (0, 0))
+                    drawn.append(pygame.image.tostring(field, 'RGB'))
+                self.failUnless(drawn[0] == drawn[1], key)
+
+@unittest.skipIf(guicache is None, "pygame not available")
+class TextCacheCheck(unittest.TestCase):
+
+    def testRendered(self):
+        """texts should be rendered once, fonts loaded once per size"""
+        pygame.font.init()
+        fonts = guicache.FontRegistry()
+        cache = guicache.TextCache(fonts, maxentries=2)
+
+        text = cache.get("Kano", 36, (10, 10, 10))
+        self.failUnless(cache.get("Kano", 36, [ 10, 10, 10 ]) is text)
+        self.failIf(cache.get("Kano", 36, (255, 0, 0)) is text)
+        self.failUnless(fonts.get(36) is fonts.get(36, 'Arial'))
+        self.assertEqual(len(fonts.paths), 1)
+
+        cache.get("Sonya", 36, (10, 10, 10))
+        self.assertEqual(len(cache.texts), 2)
+        self.failIf(cache.get("Kano", 36, (10, 10, 10)) is text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'montecarlo', Pryscola's Monte Carlo player."""
+
+import os
+import random
+import sys
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+import briscola
+import montecarlo
+
+class GreedyChoiceCheck(unittest.TestCase):
+
+    def testMatchesAiPlayCard(self):
+        """greedychoice() should choose like Player.aiplaycard()"""
+        rand = random.Random(1042)
+        cards = briscola.Deck().getcardlist()
+
+        for count in range(2000):
+            drawn = rand.sample(cards, rand.randint(3, 6))
+            curbriscola = rand.choice(cards)
+            player = briscola.Player('Kano', ishuman=False)
+            player.hand = drawn[:3]
+            trick = drawn[3:]
+
+            hand = [ card.id for card in player.hand ]
+            choice = montecarlo.greedychoice(hand, 
+                [ card.id for card in trick ], curbriscola.seedidx)
+
+            if trick:
+                expected = player.aiplaycard(trick, curbriscola)
+            else:
+                expected = 0
+
+            self.assertEqual(hand[choice], player.hand[expected].id)
+
+class MonteCarloPlayerCheck(unittest.TestCase):
+
+    def testWholeGame(self):
+        """MonteCarloPlayers should play valid cards until the end"""
+        players = [ montecarlo.MonteCarloPlayer(name, number=idx, samples=5)
+                    for idx, name in enumerate(briscola.Game.nonhumans) ]
+        for player in players:
+            player.team = player.number % 2 and 'b' or 'a'
+        game = briscola.Game(players)
+
+        while not game.finished():
+            for idxplayer, player in enumerate(game.players):
+                idxcard = player.getchoice(game.cardsplayed,
+                                           game.deck.briscola)
+                self.failUnless(0 <= idxcard < len(player.hand))
+                game.playcard(idxplayer, idxcard)
+            game.resolvetrick()
+
+        self.assertEqual(sum([ player.points for player in players ]), 120)
+        for player in players:
+            self.failUnless(player.samplespersecond() > 0)
+
+    def testSeed(self):
+        """seeded players should make the same choices in the same game"""
+        points = []
+        for count in range(2):
+            players = [ montecarlo.MonteCarloPlayer(name, number=idx,
+                                                    samples=5, seed=idx)
+                        for idx, name in enumerate(('Kano', 'Sonya')) ]
+            game = briscola.Game(players, 1042)
+            while not game.finished():
+                game.step()
+            points.append([ player.points for player in players ])
+        self.assertEqual(points[0], points[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'selfplay', Pryscola's headless self-play."""
+
+import os
+import sys
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+import briscola
+import selfplay
+
+def finishedgame(points, winnerplayer=None, winnerteam=None):
+    """finishedgame(points, winnerplayer, winnerteam) -> game
+    Return something looking like a finished HeadlessGame, whose players
+    made 'points' by seat."""
+    game = briscola.Game([ briscola.Player("player%s" % seat, ishuman=False,
+                                           number=seat)
+                           for seat in range(len(points)) ], seed=0)
+    for player, playerpoints in zip(game.players, points):
+        player.points = playerpoints
+    if winnerplayer is not None:
+        game.winnerplayer = game.players[winnerplayer]
+    game.winnerteam = winnerteam
+    return game
+
+class SelfPlayStatsCheck(unittest.TestCase):
+
+    def testAdd(self):
+        """add() should count wins, draws and the points of each seat"""
+        stats = selfplay.SelfPlayStats(2)
+        stats.add(finishedgame([ 70, 50 ], winnerplayer=0))
+        stats.add(finishedgame([ 70, 50 ], winnerplayer=0))
+        stats.add(finishedgame([ 60, 60 ]))
+
+        self.assertEqual(stats.games, 3)
+        self.assertEqual(stats.draws, 1)
+        self.assertEqual(stats.wins, { 0: 2 })
+        self.assertEqual(stats.points[0][70], 2)
+        self.assertEqual(stats.points[0][60], 1)
+        self.assertEqual(stats.points[1][50], 2)
+        self.assertEqual(sum(stats.points[1]), 3)
+        mean, stddev, low, high = stats.seatpoints(1)
+        self.assertAlmostEqual(mean, 160 / 3.0)
+        self.assertEqual((low, high), (50, 60))
+
+        teams = selfplay.SelfPlayStats(4)
+        teams.add(finishedgame([ 30, 20, 40, 30 ], winnerteam='a'))
+        self.assertEqual(teams.wins, { 'a': 1 })
+
+    def testMerge(self):
+        """merge() should add up wins, draws and points histograms"""
+        first = selfplay.SelfPlayStats(2)
+        first.add(finishedgame([ 70, 50 ], winnerplayer=0))
+        second = selfplay.SelfPlayStats(2, timing=True)
+        second.add(finishedgame([ 40, 80 ], winnerplayer=1))
+        second.add(finishedgame([ 60, 60 ]))
+
+        first.merge(second)
+        self.assertEqual(first.games, 3)
+        self.assertEqual(first.draws, 1)
+        self.assertEqual(first.wins, { 0: 1, 1: 1 })
+        self.assertEqual([ sum(histogram) for histogram in first.points ],
+                         [ 3, 3 ])
+        self.assertEqual(first.points[1][80], 1)
+        self.failIf(first.timing is None)
+
+class SelfPlayCheck(unittest.TestCase):
+
+    def testReproducible(self):
+        """a seeded series should give the same results whatever the size
+        of the jobs"""
+        results = [ selfplay.selfplay(12, (2, 4), processes=1,
+                                      chunksize=chunksize, seed=42)
+                    for chunksize in (12, 5, 1) ]
+
+        for nplayers in (2, 4):
+            totals = [ (stats.games, stats.draws, stats.wins, stats.points)
+                       for stats in [ result[nplayers]
+                                      for result in results ] ]
+            self.assertEqual(totals[0][0], 12)
+            self.assertEqual(totals[1], totals[0])
+            self.assertEqual(totals[2], totals[0])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'server', Pryscola's game server."""
+
+import json
+import os
+import sys
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+try:
+    from twisted.test.proto_helpers import StringTransport
+    import server
+except ImportError:
+    # Twisted is not available
+    server = None
+
+class Client:
+    """A connection to a BriscolaFactory over a fake transport."""
+
+    def __init__(self, factory, name):
+        self.protocol = factory.buildProtocol(None)
+        self.transport = StringTransport()
+        self.protocol.makeConnection(self.transport)
+        self.send(name)
+
+    def send(self, line):
+        """send(line) -> reply"""
+        self.transport.clear()
+        self.protocol.dataReceived(line + "\r\n")
+        return self.transport.value()
+
+@unittest.skipIf(server is None, "Twisted not available")
+class ServerCheck(unittest.TestCase):
+
+    def testTables(self):
+        """two tables should play their games at the same time"""
+        factory = server.BriscolaFactory()
+        ema, davide, alessandro = [ Client(factory, name) for name in
+                                    ('ema', 'davide', 'alessandro') ]
+
+        self.assertEqual(ema.send('create'), "table 1 created\n")
+        self.assertEqual(davide.send('join 1'), "joined table 1\n")
+        self.assertEqual(alessandro.send('start'), "not at a table\n")
+        self.assertEqual(alessandro.send('join x'), "usage: join #\n")
+        self.assertEqual(alessandro.send('create'), "table 2 created\n")
+        self.assertEqual(alessandro.send('bot'), "bot1 joined\n")
+        self.assertEqual(ema.send('players'), "ema davide\n")
+
+        ema.send('start')
+        alessandro.send('start')
+        self.assertEqual(ema.send('start'), "table 1 is already playing\n")
+        self.assertEqual(alessandro.send('tables'),
+                         "1 (playing): ema davide\n"
+                         "2 (playing): alessandro bot1\n")
+
+        replies = { 1: "", 2: "" }
+        while factory.registry.tables:
+            for client, tableid in ((ema, 1), (davide, 1), (alessandro, 2)):
+                reply = client.send('play 0')
+                replies[tableid] += reply
+
+        for tableid in (1, 2):
+            self.failUnless("game over" in replies[tableid])
+        self.assertEqual(ema.send('hand'), "not at a table\n")
+
+        davide.protocol.connectionLost(None)
+        self.failIf('davide' in factory.registry.names)
+
+    def testMixedModes(self):
+        """text and machine mode clients should play at the same table,
+        getting each other's events"""
+        factory = server.BriscolaFactory()
+        bob = Client(factory, 'bob')
+        alice = Client(factory, 'machine')
+        self.assertEqual(json.loads(alice.send(json.dumps({ 'id': 1,
+            'cmd': 'login', 'args': [ u'alice' ] })))['result'], 'alice')
+        self.assertEqual(json.loads(alice.send(json.dumps({ 'id': 2,
+            'cmd': 'login', 'args': [ 42 ] })))['error'],
+            "already logged in")
+        self.assertEqual(json.loads(Client(factory, 'machine').send(
+            json.dumps({ 'cmd': 'login', 'args': [ 42 ] })))['error'],
+            "usage: login name")
+
+        bob.send('create')
+        alice.send(json.dumps({ 'cmd': 'join', 'args': [ 1 ] }))
+        bob.send('start')
+
+        # bob leads the first trick, then whoever wins the last one
+        replies = ""
+        while factory.registry.tables:
+            reply = bob.send('play 0')
+            if reply == "Not your turn!\n":
+                bob.transport.clear()
+                reply = alice.send(json.dumps({ 'cmd': 'play',
+                                                'args': [ 0 ] }))
+                self.failIf('"ok": false' in reply)
+                # what has been pushed to bob meanwhile
+                reply = bob.transport.value()
+            replies += reply
+        self.failUnless("* alice played " in replies)
+        self.failUnless("game over: " in replies)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,339 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'session', the line protocol of Pryscola's game
+server."""
+
+import json
+import os
+import sys
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+import session
+import tables
+
+class SessionCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = tables.TableRegistry()
+
+    def login(self, name):
+        client = session.Session(self.registry)
+        self.assertEqual(client.greeting(), "username -> ")
+        self.assertEqual(client.receive(""), "username -> ")
+        self.assertEqual(client.receive(name), "Hello %s\n" % name)
+        return client
+
+    def testCommands(self):
+        """commands should act on the table of the player"""
+        ema = self.login('ema')
+        davide = self.login('davide')
+        self.assertEqual(session.Session(self.registry).receive('ema'),
+                         "name ema is taken\n")
+
+        self.assertEqual(ema.receive('hand'), "not at a table\n")
+        self.assertEqual(ema.receive('create'), "table 1 created\n")
+        self.assertEqual(davide.receive('join'), "usage: join #\n")
+        self.assertEqual(davide.receive('join 1'), "joined table 1\n")
+        self.assertEqual(davide.receive('bot'), "bot1 joined\n")
+        self.assertEqual(ema.receive('players'), "ema davide bot1\n")
+        self.assertEqual(ema.receive('tables'),
+                         "1 (waiting): ema davide bot1\n")
+        self.assertEqual(davide.receive('leave'), "left table 1\n")
+        self.assertEqual(ema.receive('unknown'), "")
+
+    def testWholeGame(self):
+        """a game should be played until the results"""
+        ema = self.login('ema')
+        ema.receive('create')
+        ema.receive('bot')
+        ema.receive('bot')
+        ema.receive('start')
+
+        replies = ""
+        while self.registry.tables:
+            replies += ema.receive('play 0')
+
+        self.failUnless(replies.endswith("\n"))
+        self.failUnless("game over: ema " in replies)
+        self.assertEqual(ema.receive('field'), "not at a table\n")
+
+    def testVersions(self):
+        """views should be sent only if the table changed since the version
+        the client has"""
+        ema = self.login('ema')
+        ema.receive('create')
+        ema.receive('bot')
+        self.assertEqual(ema.receive('players'), "ema bot1\n")
+        version = int(ema.receive('version'))
+        self.assertEqual(ema.receive('players %s' % version), "unchanged\n")
+        self.assertEqual(ema.receive('players %s' % (version - 1)),
+                         "ema bot1\n")
+        # a version from the future
+        self.assertEqual(ema.receive('players %s' % (version + 1)),
+                         "ema bot1\n")
+
+        # a version of another table, changed as many times
+        davide = self.login('davide')
+        ema.receive('bot')
+        version = int(ema.receive('version'))
+        ema.receive('leave')
+        davide.receive('create')
+        davide.receive('bot')
+        ema.receive('join 2')
+        self.assertEqual(ema.receive('players %s' % version),
+                         "davide bot1 ema\n")
+        ema.receive('leave')
+        ema.receive('create')
+        ema.receive('bot')
+
+        ema.receive('start')
+        hand = ema.receive('hand')
+        self.failUnless(ema.receive('hand') is hand)
+        version = int(ema.receive('version'))
+        self.assertEqual(ema.receive('hand %s' % version), "unchanged\n")
+
+        # the first seat leads the first trick
+        ema.receive('play 0')
+        self.failIf(ema.receive('hand %s' % version) == "unchanged\n")
+
+    def testQuit(self):
+        """quit should close the session, disconnect() log out"""
+        ema = self.login('ema')
+        ema.receive('create')
+        self.assertEqual(ema.receive('quit'), "")
+        self.failUnless(ema.closed)
+
+        ema.disconnect()
+        ema.disconnect()
+        self.assertEqual(self.registry.names, set())
+        self.assertEqual(self.registry.tables, {})
+
+def replies(data):
+    """replies(data) -> list
+    Return the machine mode replies in 'data', without the events."""
+    return [ reply for reply in map(json.loads, data.splitlines())
+             if 'event' not in reply ]
+
+class MachineCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = tables.TableRegistry()
+        self.client = session.Session(self.registry)
+        self.assertEqual(json.loads(self.client.receive('machine')),
+                         { 'ok': True, 'result': 'machine' })
+
+    def request(self, cmd, *args):
+        """request(cmd, *args) -> reply
+        Send a request, return the reply to it, skipping the events."""
+        return replies(self.client.receive(json.dumps({ 'id': cmd,
+            'cmd': cmd, 'args': args })))[-1]
+
+    def testRequests(self):
+        """requests should be answered with structured results and their
+        ids"""
+        self.assertEqual(self.request('hand'), { 'id': 'hand', 'ok': False,
+                                                 'error': "not logged in" })
+        self.assertEqual(self.request('login', 'ema')['result'], 'ema')
+        self.assertEqual(self.request('create')['result'],
+            { 'id': 1, 'state': 'waiting', 'players': [ 'ema' ] })
+        self.request('bot')
+        self.assertEqual(self.request('start')['result'],
+                         { 'results': None })
+
+        hand = self.request('hand')['result']
+        self.assertEqual(len(hand), 3)
+        self.assertEqual(sorted(hand[0]), [ 'id', 'points', 'seed',
+                                            'value' ])
+
+        field = self.request('field')['result']
+        self.assertEqual(field['turn'], 'ema')
+        self.assertEqual(field['played'], [])
+
+        played = self.request('play', 0)
+        self.failUnless(played['ok'])
+        for key in ('hand', 'field', 'handwinner', 'results'):
+            self.failUnless(key in played['result'])
+
+        self.assertEqual(self.request('nonsense')['error'],
+                         "unknown command nonsense")
+        self.assertEqual(self.request('hand')['result'],
+                         played['result']['hand'])
+        self.assertEqual(json.loads(self.client.receive('{ nope')),
+            { 'id': None, 'ok': False, 'error': "invalid request" })
+
+    def testVersions(self):
+        """conditional requests should get the view only if it changed"""
+        self.request('login', 'ema')
+        self.request('create')
+        self.request('bot')
+        self.request('start')
+
+        field = self.request('field')
+        self.assertEqual(self.client.receive(json.dumps({ 'id': 1,
+            'cmd': 'field', 'since': field['version'] })),
+            json.dumps({ 'id': 1, 'ok': True, 'version': field['version'],
+                         'unchanged': True }) + "\n")
+        self.assertEqual(replies(self.client.receive(json.dumps({ 'id': 2,
+            'cmd': 'field', 'since': field['version'] - 1 })))[0]['result'],
+            field['result'])
+        self.assertEqual(json.loads(self.client.receive(json.dumps({
+            'id': 3, 'cmd': 'hand', 'since': 'x' })))['error'],
+            "invalid request")
+
+        played = self.request('play', 0)
+        self.failUnless(played['result']['version'] > field['version'])
+
+    def testPipelining(self):
+        """a batch of requests should be answered in order, in one
+        string"""
+        lines = [ json.dumps({ 'id': idx, 'cmd': cmd, 'args': args })
+                  for idx, (cmd, args) in enumerate([ ('login', [ 'ema' ]),
+                  ('create', []), ('bot', []), ('players', []),
+                  ('quit', []), ('players', []) ]) ]
+
+        received = replies(self.client.receivelines(lines))
+        self.assertEqual([ reply['id'] for reply in received ], range(5))
+        self.assertEqual(received[3]['result'], [ 'ema', 'bot1' ])
+        self.failUnless(self.client.closed)
+
+class EventCheck(unittest.TestCase):
+
+    def setUp(self):
+        # the same game at each run
+        self.registry = tables.TableRegistry(seed=1042)
+        self.pushed = {}
+
+    def login(self, name, machine=False):
+        self.pushed[name] = []
+        client = session.Session(self.registry, self.pushed[name].append)
+        if machine:
+            client.receive('machine')
+            client.receive(json.dumps({ 'cmd': 'login', 'args': [ name ] }))
+        else:
+            client.receive(name)
+        return client
+
+    def testPush(self):
+        """the players seated and the spectators should get the events of
+        the table, each event being formatted once per mode"""
+        ema = self.login('ema')
+        davide = self.login('davide', machine=True)
+        alessandro = self.login('alessandro')
+        ema.receive('create')
+        davide.receive(json.dumps({ 'cmd': 'join', 'args': [ 1 ] }))
+        self.assertEqual(alessandro.receive('watch 1'),
+                         "watching table 1\n")
+        self.assertEqual(alessandro.receive('join 1'),
+                         "already at table 1\n")
+
+        # the events of its own commands come with the replies
+        reply = ema.receive('start')
+        self.failUnless(reply.startswith("* game started, briscola: "))
+        self.assertEqual(len(self.pushed['ema']), 0)
+
+        events = [ json.loads(line) for line in self.pushed['davide'] ]
+        self.assertEqual([ event['event'] for event in events ],
+                         [ 'start', 'dealt' ])
+        self.assertEqual(events[0]['data']['players'], [ 'ema', 'davide' ])
+        self.assertEqual(len(events[1]['data']['cards']), 3)
+        # no hand for spectators
+        self.assertEqual(len(self.pushed['alessandro']), 1)
+
+        # the first seat leads the first trick
+        table = self.registry.tables[1]
+        ema.receive('play 0')
+        event = json.loads(self.pushed['davide'][-1])
+        self.assertEqual((event['event'], event['data']['player'],
+                          event['data']['turn']), ('played', 'ema', 'davide'))
+        self.failUnless(self.pushed['alessandro'][-1].startswith(
+            "* ema played "))
+
+        reply = davide.receive(json.dumps({ 'cmd': 'play', 'args': [ 0 ] }))
+        self.assertEqual([ json.loads(line).get('event')
+                           for line in reply.splitlines() ],
+                         [ 'played', 'trick', 'dealt', None ])
+        # the same lines for all the text mode connections, but the cards
+        # dealt to ema only
+        self.failUnless(self.pushed['ema'][-3].startswith(
+            "* davide played "))
+        self.failUnless(self.pushed['ema'][-3] is
+                        self.pushed['alessandro'][-2])
+        self.failUnless(self.pushed['ema'][-2] is
+                        self.pushed['alessandro'][-1])
+        self.failUnless(self.pushed['ema'][-1].startswith("* dealt: "))
+
+        # spectators joining mid-game can get the current state
+        self.assertEqual(alessandro.receive('field'), ema.receive('field'))
+        self.assertEqual(alessandro.receive('players'),
+                         ema.receive('players'))
+        self.failUnless(alessandro.receive('players').startswith("ema"))
+        self.assertEqual(alessandro.receive('version'),
+                         "%s\n" % table.version)
+        self.assertEqual(alessandro.receive('hand'), "not at a table\n")
+
+        alessandro.receive('leave')
+        self.assertEqual(table.spectators, set())
+        count = len(self.pushed['alessandro'])
+
+        received = ""
+        while self.registry.tables:
+            received += ema.receive('play 0')
+            received += davide.receive(json.dumps({ 'cmd': 'play',
+                                                    'args': [ 0 ] }))
+        self.assertEqual(len(self.pushed['alessandro']), count)
+        self.failUnless("* game over: " in received + "".join(
+            self.pushed['ema']))
+
+    def testNames(self):
+        """text mode names should be valid UTF-8, to be sent to machine
+        mode clients"""
+        client = session.Session(self.registry, [].append)
+        self.assertEqual(client.receive('\xff'), "invalid name\n")
+        self.assertEqual(self.registry.names, set())
+
+        name = u'p\xe8'.encode('utf-8')
+        pe = self.login(name)
+        davide = self.login('davide', machine=True)
+        pe.receive('create')
+
+        tablelist = json.loads(davide.receive(json.dumps({
+            'cmd': 'tables' })))['result']
+        self.assertEqual(tablelist[0]['players'], [ u'p\xe8' ])
+        davide.receive(json.dumps({ 'cmd': 'join', 'args': [ 1 ] }))
+        pe.receive('start')
+        events = [ json.loads(line) for line in self.pushed['davide'] ]
+        self.assertEqual(events[0]['data']['players'], [ u'p\xe8',
+                                                         'davide' ])
+
+    def testSerializedOnce(self):
+        """an event should be formatted once for all the connections"""
+        formatted = []
+        def formatter(event):
+            formatted.append(event)
+            return event.name
+        event = tables.Event('trick', { 'winner': 'ema' })
+        self.assertEqual(event.serialize(formatter), 'trick')
+        self.assertEqual(event.serialize(formatter), 'trick')
+        self.assertEqual(len(formatted), 1)
+
+if __name__ == '__main__':
+    unittest.main()
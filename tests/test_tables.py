@@ -0,0 +1,255 @@
+#!/usr/bin/python
+#
+# This file is part of Pryscola.
+#
+# Pryscola is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pryscola is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Unit testing of 'tables', the tables of Pryscola's game server."""
+
+import os
+import sys
+import unittest
+
+MAINDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(MAINDIR)
+
+import briscola
+import tables
+
+def playgame(table, names):
+    """Play the game of 'table' until the end, 'names' playing their first
+    card in turn."""
+    while not table.finished():
+        for name in names:
+            if table.curplayer == table.turn(name):
+                table.playcard(name, 0)
+                break
+
+class RegistryCheck(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = tables.TableRegistry()
+        for name in ('ema', 'davide', 'alessandro'):
+            self.registry.login(name)
+
+    def testLobby(self):
+        """players should create, join and leave tables"""
+        registry = self.registry
+        self.assertRaises(tables.TableError, registry.login, 'ema')
+
+        first = registry.create('ema')
+        second = registry.create('davide')
+        self.failIf(first is second)
+        self.failUnless(registry.join('alessandro', first.id) is first)
+        self.failUnless(registry.gettable('alessandro') is first)
+        self.assertRaises(tables.TableError, registry.join, 'ema', second.id)
+        self.assertRaises(tables.TableError, registry.join, 'ema', 42)
+        self.assertEqual(first.players, [ 'ema', 'alessandro' ])
+
+        registry.leave('ema')
+        self.assertEqual(first.players, [ 'alessandro' ])
+        self.assertEqual(first.seats, { 'alessandro': 0 })
+        self.assertRaises(tables.TableError, registry.gettable, 'ema')
+
+        # the last human leaving drops the table
+        registry.logout('davide')
+        self.failIf(second.id in registry.tables)
+        self.failIf('davide' in registry.names)
+        self.assertEqual(registry.tablelist(), [ first ])
+        self.assertEqual(first.state(), "waiting")
+
+    def testNames(self):
+        """players should not take the names of bots, nor sit twice"""
+        registry = self.registry
+        self.assertRaises(tables.TableError, registry.login, 'bot1')
+        registry.login('bottle')
+
+        table = registry.create('ema')
+        self.assertEqual(table.addbot(), 'bot1')
+        self.assertRaises(tables.TableError, table.sit, 'ema')
+        self.assertRaises(tables.TableError, table.sit, 'bot1')
+        self.assertEqual(table.players, [ 'ema', 'bot1' ])
+
+        # no empty table is left behind when creating one fails
+        registry.spectate('bottle', table.id)
+        for name in ('ema', 'bottle'):
+            self.assertRaises(tables.TableError, registry.create, name)
+        self.assertEqual(registry.tablelist(), [ table ])
+        self.assertEqual(registry.create('davide').id, table.id + 1)
+
+    def testIndependentGames(self):
+        """games at different tables should not interfere"""
+        registry = self.registry
+        first = registry.create('ema')
+        registry.join('davide', first.id)
+        second = registry.create('alessandro')
+        second.addbot()
+        second.addbot()
+
+        first.start()
+        second.start()
+        self.assertRaises(tables.TableError, first.start)
+        self.assertRaises(tables.TableError, registry.join, 'ema', second.id)
+
+        playgame(first, [ 'ema', 'davide' ])
+        playgame(second, [ 'alessandro' ])
+
+        for table in (first, second):
+            self.assertEqual(table.state(), "finished")
+            self.assertEqual(sum([ points for name, points
+                                   in table.results() ]), 120)
+            registry.reclaim(table)
+        self.assertEqual(registry.tables, {})
+        self.assertEqual(registry.playertables, {})
+
+    def testSeed(self):
+        """tables should deal the games of the series of their registry"""
+        hands = []
+        for count in range(2):
+            registry = tables.TableRegistry(seed=1042)
+            registry.login('ema')
+            table = registry.create('ema')
+            table.addbot()
+            table.start()
+            hands.append(table.hand('ema'))
+        self.assertEqual(hands[0], hands[1])
+
+        table = tables.Table(1)
+        table.sit('ema')
+        table.sit('davide')
+        table.start(briscola.gameseed(1042, 1))
+        self.assertEqual(table.hand('ema'), hands[0])
+
+        # and bots limited by samples only should play the same games
+        results = []
+        for count in range(2):
+            table = tables.Table(1, samples=5, budget=None, seed=1042)
+            table.addbot()
+            table.addbot()
+            table.start()
+            results.append(table.results())
+        self.failUnless(table.finished())
+        self.assertEqual(results[0], results[1])
+
+    def testTurns(self):
+        """only the player whose turn it is should play"""
+        table = self.registry.create('ema')
+        self.registry.join('davide', table.id)
+        self.assertRaises(tables.TableError, table.playcard, 'ema', 0)
+        table.start()
+
+        first = table.game.players[0].name
+        second = table.game.players[1].name
+        self.assertRaises(tables.TableError, table.playcard, second, 0)
+        self.assertRaises(tables.TableError, table.playcard, first, 3)
+        table.playcard(first, 0)
+        table.playcard(second, 0)
+        self.failIf(table.handwinner is None)
+
+    def testLeavePlaying(self):
+        """bots should take the seats of the players leaving a game, and
+        the table be dropped when no human is left"""
+        registry = self.registry
+        table = registry.create('ema')
+        registry.join('davide', table.id)
+        table.addbot()
+        table.start()
+
+        registry.leave('ema')
+        self.failUnless(table.id in registry.tables)
+        self.assertEqual(len(table.players), 3)
+
+        registry.leave('davide')
+        self.failIf(table.id in registry.tables)
+        self.failUnless(table.finished())
+        self.assertEqual(sum(table.game.points.values()), 120 -
+                         table.game.deck.removedcard.points)
+
+    def testBotLimits(self):
+        """bots should search within the limits given to the registry"""
+        registry = tables.TableRegistry(samples=10, budget=2)
+        registry.login('ema')
+        table = registry.create('ema')
+        table.addbot()
+        table.start()
+
+        bot = table.gameplayers['bot1']
+        self.assertEqual((bot.samples, bot.budget), (10, 2))
+        self.assertEqual(self.registry.create('ema').budget,
+                         tables.BOTBUDGET)
+
+    def testEvents(self):
+        """seated players and spectators should get the events of the
+        game, and the cards dealt only to whom they are dealt"""
+        registry = tables.TableRegistry()
+        events = {}
+        for name in ('ema', 'davide', 'alessandro'):
+            events[name] = []
+            registry.login(name, events[name].append)
+
+        table = registry.create('ema')
+        registry.join('davide', table.id)
+        registry.spectate('alessandro', table.id)
+        self.assertRaises(tables.TableError, registry.join, 'alessandro',
+                          table.id)
+        table.start()
+        playgame(table, [ 'ema', 'davide' ])
+
+        names = [ event.name for event in events['alessandro'] ]
+        self.assertEqual(names.count('played'), 40)
+        self.assertEqual(names.count('trick'), 20)
+        self.assertEqual(names[0], 'start')
+        self.assertEqual(names[-1], 'over')
+        self.failIf('dealt' in names)
+
+        # 3 cards at the start, then one per trick until the deck is empty
+        for name in ('ema', 'davide'):
+            dealt = [ card for event in events[name]
+                      if event.name == 'dealt'
+                      for card in event.data['cards'] ]
+            self.assertEqual(len(dealt), 20)
+            self.failUnless(events[name][0] is events['alessandro'][0])
+
+        registry.reclaim(table)
+        self.assertEqual(registry.spectating, {})
+
+    def testVersions(self):
+        """every change should make a new version of the table, and views
+        be rendered once per version"""
+        table = self.registry.create('ema')
+        versions = [ table.version ]
+        self.registry.join('davide', table.id)
+        versions.append(table.version)
+        table.start()
+        versions.append(table.version)
+        self.assertEqual(versions, sorted(set(versions)))
+
+        rendered = []
+        def render():
+            rendered.append(table.version)
+            return "view %s" % table.version
+        self.assertEqual(table.view('field', render), table.view('field',
+                                                                 render))
+        self.assertEqual(rendered, [ table.version ])
+
+        name = table.game.players[0].name
+        table.playcard(name, 0)
+        self.assertEqual(table.version, versions[-1] + 1)
+        self.assertEqual(table.view('field', render),
+                         "view %s" % table.version)
+        self.assertEqual(len(rendered), 2)
+
+if __name__ == '__main__':
+    unittest.main()